@@ -0,0 +1,98 @@
+"""
+G 代码输出的基准测试: 20 万段的轮廓(直线和圆弧各半),
+对比原来逐行 str.format、逐段调用 formatter.block 和整段 formatter.blocks 的耗时。
+
+    python examples/bench_nc_format.py [段数]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cutter.geometry import ARC, LINE  # noqa: E402
+from cutter.nc_format import CompactFormatter, FixedFormatter  # noqa: E402
+
+
+def zigzag(count):
+    # 沿 X 前进的锯齿线, 每隔一段换成半圆弧
+    rng = np.random.default_rng(0)
+    xs = np.arange(count + 1) * 0.5
+    ys = rng.uniform(0, 20, count + 1)
+    points = np.column_stack([xs, ys])
+    kinds = np.where(np.arange(count) % 2 == 0, LINE, ARC)
+    centers = (points[:-1] + points[1:]) / 2
+    ccw = np.arange(count) % 4 == 1
+    return kinds, points, centers, ccw
+
+
+def str_format(kinds, points, centers, ccw):
+    # user-022 之前 GCode.move_xy / move_arc 的写法
+    lines = []
+    for k, kind in enumerate(kinds.tolist()):
+        x, y = points[k + 1].tolist()
+        if kind == LINE:
+            lines.append("G01 X{:.3f} Y{:.3f}".format(x, y))
+        else:
+            i, j = (centers[k] - points[k]).tolist()
+            lines.append(
+                "{} X{:.3f} Y{:.3f} I{:.3f}  J{:.3f}".format(
+                    "G03" if ccw[k] else "G02", x, y, i, j
+                )
+            )
+    return lines
+
+
+def block_by_block(formatter, kinds, points, centers, ccw):
+    lines = []
+    for k, kind in enumerate(kinds.tolist()):
+        x, y = points[k + 1].tolist()
+        if kind == LINE:
+            lines.append(formatter.block(1, x, y))
+        else:
+            i, j = (centers[k] - points[k]).tolist()
+            lines.append(formatter.block(3 if ccw[k] else 2, x, y, None, i, j))
+    return lines
+
+
+def blocks(formatter, kinds, points, centers, ccw):
+    is_arc = kinds == ARC
+    motions = np.where(is_arc, np.where(ccw, 3, 2), 1)
+    offsets = np.where(is_arc[:, None], centers - points[:-1], np.nan)
+    zs = np.full(len(kinds), np.nan)
+    return formatter.blocks(motions, points[1:], zs, offsets)
+
+
+def timed(name, function, *args, repeat=3):
+    # 取几次中最快的一次, 减少机器负载的影响
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lines = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<24}{best:8.3f} s")
+    return lines
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    contour = zigzag(count)
+    print(f"{count} segments")
+
+    baseline = timed("str.format", str_format, *contour)
+    fixed = timed("fixed block", lambda: block_by_block(FixedFormatter(), *contour))
+    assert fixed == baseline
+    fixed_blocks = timed("fixed blocks", lambda: blocks(FixedFormatter(), *contour))
+    assert fixed_blocks == fixed
+
+    compact = timed(
+        "compact block", lambda: block_by_block(CompactFormatter(), *contour)
+    )
+    compact_blocks = timed(
+        "compact blocks", lambda: blocks(CompactFormatter(), *contour)
+    )
+    assert compact_blocks == compact
@@ -0,0 +1,148 @@
+import math
+
+import numpy as np
+
+from cutter.geometry import ARC, LINE, Contour, line_runs
+
+# 单段圆弧最大转角, 避免接近整圆时 I/J 起止点重合
+MAX_SWEEP = math.pi
+# 半径过大的圆弧与直线差别不大, 保留直线
+MAX_RADIUS = 10000.0
+
+
+def circle_through(p1, p2, p3):
+    ax, ay = p1
+    bx, by = p2
+    cx, cy = p3
+    d = 2.0 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if abs(d) < 1e-12:
+        return None
+
+    a2 = ax * ax + ay * ay
+    b2 = bx * bx + by * by
+    c2 = cx * cx + cy * cy
+    ux = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+    uy = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+
+    return np.array([ux, uy])
+
+
+def fit_arc(points, tolerance):
+    """
+    用一段圆弧拟合折线 points, 圆弧经过首、中、尾三个顶点。
+    所有顶点和各段中点到圆弧的距离都不超过 tolerance 时返回 (圆心, 是否逆时针),
+    否则返回 None。
+    """
+    center = circle_through(points[0], points[len(points) // 2], points[-1])
+    if center is None:
+        return None
+
+    radius = math.hypot(*(points[0] - center))
+    if radius > MAX_RADIUS:
+        return None
+
+    # 每一段都必须朝同一方向转, 且总转角不超过 MAX_SWEEP
+    v1 = points[:-1] - center
+    v2 = points[1:] - center
+    cross = v1[:, 0] * v2[:, 1] - v1[:, 1] * v2[:, 0]
+    dot = (v1 * v2).sum(axis=1)
+    steps = np.arctan2(cross, dot)
+    ccw = bool(steps.sum() > 0)
+    if ccw and (steps <= 0).any() or not ccw and (steps >= 0).any():
+        return None
+    if abs(steps.sum()) > MAX_SWEEP:
+        return None
+
+    distances = np.hypot(*(points - center).T)
+    if np.abs(distances - radius).max() > tolerance:
+        return None
+
+    middles = (points[:-1] + points[1:]) / 2
+    if (radius - np.hypot(*(middles - center).T)).max() > tolerance:
+        return None
+
+    return (center, ccw)
+
+
+def fit_run(points, tolerance, min_segments):
+    """把一段连续折线拆成圆弧和直线, 返回 [(类型, 终点下标, 圆心, 是否逆时针)]"""
+    pieces = []
+    m = len(points) - 1
+    i = 0
+
+    while i < m:
+        # best 是最长的可拟合圆弧, 覆盖 good 段
+        best, good = None, 0
+        if m - i >= min_segments:
+            fit = fit_arc(points[i : i + min_segments + 1], tolerance)
+            if fit is not None:
+                # 先倍增找到拟合失败的长度, 再二分找到最长的可拟合长度
+                good, bad = min_segments, None
+                best = fit
+                while good < m - i:
+                    length = min(good * 2, m - i)
+                    fit = fit_arc(points[i : i + length + 1], tolerance)
+                    if fit is None:
+                        bad = length
+                        break
+                    good, best = length, fit
+
+                while bad is not None and bad - good > 1:
+                    length = (good + bad) // 2
+                    fit = fit_arc(points[i : i + length + 1], tolerance)
+                    if fit is None:
+                        bad = length
+                    else:
+                        good, best = length, fit
+
+        if best is not None:
+            pieces.append((ARC, i + good, best[0], best[1]))
+            i += good
+        else:
+            pieces.append((LINE, i + 1, None, True))
+            i += 1
+
+    return pieces
+
+
+def fit_arcs(contour, tolerance, min_segments=3):
+    """
+    把轮廓中连续的短直线段替换成误差 tolerance 以内的圆弧。
+    返回 (新轮廓, 减少的程序段数)。
+    """
+    runs = dict(line_runs(contour.kinds))
+    kinds = []
+    points = [contour.points[0]]
+    centers = []
+    ccw = []
+    k = 0
+
+    while k < len(contour):
+        if k in runs and runs[k] - k >= min_segments:
+            end = runs[k]
+            run = contour.points[k : end + 1]
+            for kind, index, center, is_ccw in fit_run(run, tolerance, min_segments):
+                kinds.append(kind)
+                points.append(run[index])
+                centers.append((0.0, 0.0) if center is None else center)
+                ccw.append(is_ccw)
+            k = end
+        else:
+            kinds.append(contour.kinds[k])
+            points.append(contour.points[k + 1])
+            centers.append(contour.centers[k])
+            ccw.append(contour.ccw[k])
+            k += 1
+
+    removed = len(contour) - len(kinds)
+    if removed == 0:
+        return (contour, 0)
+
+    fitted = Contour(
+        np.array(kinds, dtype=np.int8),
+        np.array(points, dtype=np.float64),
+        np.array(centers, dtype=np.float64).reshape(-1, 2),
+        np.array(ccw, dtype=bool),
+    )
+
+    return (fitted, removed)
@@ -0,0 +1,109 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import ezdxf
+
+from cutter.consts import SUPPORTED_ENTITY_TYPES
+from cutter.gcode import GCode
+from cutter.geometry import Geometry
+
+
+def load_geometry(path):
+    doc = ezdxf.readfile(path)
+    entities = doc.modelspace().query(" ".join(SUPPORTED_ENTITY_TYPES))
+    return Geometry.from_entities(entities)
+
+
+def recipe_params(recipe):
+    # 与 GCode 构造参数同名, 可以直接展开传入
+    return {
+        "tool_radius": recipe._tool_radius,
+        "cutter_offset": recipe._cutter_offset,
+        "rotation_speed": recipe._rotation_speed,
+        "cutter_deepth": recipe._cutter_deepth,
+    }
+
+
+def generate_program(source, params, alignment):
+    """
+    生成一个完整的程序。source 是 Geometry 或 dxf 文件路径,
+    在子进程中读取 dxf 可以让解析也并行。
+    """
+    geometry = load_geometry(source) if isinstance(source, str) else source
+    return GCode(geometry, alignment=alignment, **params).generate()
+
+
+def generate_part_lines(geometry, params, alignment):
+    # 只生成零件的切割指令, 程序头尾由 generate_parts 统一添加
+    generator = GCode(geometry, alignment=alignment, **params)
+    generator.prepare_geometry()
+    return list(generator.iter_contour_lines())
+
+
+def generate_programs(jobs, alignment, max_workers=None):
+    """
+    并行生成互不相关的程序, 例如一批配方各自的程序。
+    jobs 是 [(Geometry 或 dxf 路径, 参数), ...], 参数是 GCode 的关键字参数,
+    返回的程序文本与 jobs 顺序一致。
+    """
+    jobs = list(jobs)
+    alignment = dict(alignment)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(generate_program, source, params, alignment)
+            for source, params in jobs
+        ]
+        return [f.result() for f in futures]
+
+
+def generate_recipes(recipes, dxf_dir, alignment, max_workers=None):
+    # 每个配方生成一个程序, dxf 在子进程中读取
+    jobs = [(os.path.join(dxf_dir, f"{r._id}.dxf"), recipe_params(r)) for r in recipes]
+    return generate_programs(jobs, alignment, max_workers)
+
+
+def generate_parts(geometries, params, alignment, max_workers=None):
+    """
+    把同一张板材上的多个零件分给多个进程生成, 再按顺序拼成一个程序。
+    所有零件共用一组刀具参数, 并且整体平移到对刀位置, 零件之间的相对位置不变。
+    """
+    geometries = list(geometries)
+    alignment = dict(alignment)
+
+    # 程序头尾和整体检查在当前进程完成
+    whole = GCode(Geometry.concatenate(geometries), alignment=alignment, **params)
+    whole.check_tool_params()
+    whole.check_entities()
+    whole.check_alignment()
+
+    # 每个零件按自己的外包框平移, 调整对刀位置使所有零件的平移量相同
+    extmin = whole.geometry.extmin
+    parts = []
+    for geometry in geometries:
+        # 空零件没有外包框, 与 Geometry.concatenate 一样跳过
+        if extmin is None or geometry.extmin is None:
+            continue
+        part_alignment = dict(alignment)
+        part_alignment["x"] = alignment["x"] + float(geometry.extmin[0] - extmin[0])
+        part_alignment["y"] = alignment["y"] + float(geometry.extmin[1] - extmin[1])
+        parts.append((geometry, part_alignment))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(generate_part_lines, geometry, params, part_alignment)
+            for geometry, part_alignment in parts
+        ]
+
+        whole.prepare_instructions()
+        lines = whole.flush_instructions()
+        for n, future in enumerate(futures):
+            if n > 0:
+                whole.fast_move_z(whole.safe_height())
+                lines.extend(whole.flush_instructions())
+            lines.extend(future.result())
+            # 零件的指令由其他进程生成, 之后的指令不能沿用本进程记录的模态
+            whole.formatter.reset()
+
+    whole.end_instructions()
+    lines.extend(whole.flush_instructions())
+    return "\n".join(lines)
@@ -0,0 +1,231 @@
+import math
+
+import numpy as np
+
+# 曲线拟合的默认误差(mm)
+CURVE_TOLERANCE = 0.01
+# 单条曲线采样点数的上下限
+MIN_SAMPLES = 16
+MAX_SAMPLES = 20000
+
+
+def normalize(v):
+    length = math.hypot(v[0], v[1])
+    if length < 1e-12:
+        return None
+    return v / length
+
+
+def tangent_bulge(start, end, tangent):
+    """
+    从 start 出发、起点切向为 tangent、终点为 end 的圆弧的凸度。
+    弦切角 a 是转角的一半, 凸度为 tan(a / 2), 转角超过 180 度时返回 None。
+    """
+    chord = end - start
+    cross = tangent[0] * chord[1] - tangent[1] * chord[0]
+    dot = tangent[0] * chord[0] + tangent[1] * chord[1]
+    alpha = math.atan2(cross, dot)
+    if abs(alpha) > math.pi / 2:
+        return None
+    if abs(alpha) < 1e-9:
+        return 0.0
+    return math.tan(alpha / 2)
+
+
+def bulge_deviation(points, start, end, bulge):
+    # points 到凸度圆弧(或直线)所在圆(或直线)的最大距离
+    if len(points) == 0:
+        return 0.0
+
+    chord = end - start
+    length = math.hypot(chord[0], chord[1])
+    if length < 1e-12:
+        return float(np.hypot(*(points - start).T).max())
+
+    if bulge == 0.0:
+        cross = chord[0] * (points[:, 1] - start[1]) - chord[1] * (
+            points[:, 0] - start[0]
+        )
+        return float(np.abs(cross).max() / length)
+
+    # 与 geometry.bulge_arcs 相同的换算
+    signed_radius = length * (1.0 + bulge * bulge) / 4.0 / bulge
+    direction = math.atan2(chord[1], chord[0]) + math.pi / 2 - math.atan(bulge) * 2
+    center = start + signed_radius * np.array(
+        [math.cos(direction), math.sin(direction)]
+    )
+    distances = np.hypot(*(points - center).T)
+    return float(np.abs(distances - abs(signed_radius)).max())
+
+
+def biarc(p0, t0, p1, t1):
+    """
+    连接 p0(切向 t0) 和 p1(切向 t1) 的双圆弧, 两段圆弧在连接点处切向相同。
+    取两段控制臂长度相等的解, 返回 (连接点, 连接点切向), 无解时返回 None。
+    """
+    v = p1 - p0
+    t = t0 + t1
+    vv = float(v @ v)
+    vt = float(v @ t)
+    denominator = 2.0 * (1.0 - float(t0 @ t1))
+
+    if denominator < 1e-12:
+        # 两端切向相同
+        vt1 = float(v @ t1)
+        if abs(vt1) < 1e-12:
+            return None
+        d = vv / (4.0 * vt1)
+    else:
+        d = (-vt + math.sqrt(vt * vt + denominator * vv)) / denominator
+
+    if d <= 0.0:
+        return None
+
+    q0 = p0 + d * t0
+    q1 = p1 - d * t1
+    joint = (q0 + q1) / 2
+    tangent = normalize(q1 - q0)
+    if tangent is None:
+        tangent = t0
+
+    return (joint, tangent)
+
+
+def fit_biarc(points, t0, t1, tolerance):
+    """
+    用一组双圆弧拟合曲线采样点 points, 两端切向为 t0 和 t1。
+    误差不超过 tolerance 时返回 [(终点, 凸度), (终点, 凸度)], 否则返回 None。
+    """
+    p0 = points[0]
+    p1 = points[-1]
+    found = biarc(p0, t0, p1, t1)
+    if found is None:
+        return None
+
+    joint, tangent = found
+    # 过连接点、垂直于切向的直线把采样点分给前后两段圆弧
+    side = (points - joint) @ tangent
+    pieces = []
+    for start, end, start_tangent, mask in (
+        (p0, joint, t0, side <= 0),
+        (joint, p1, tangent, side > 0),
+    ):
+        bulge = tangent_bulge(start, end, start_tangent)
+        if bulge is None:
+            return None
+        if bulge_deviation(points[mask], start, end, bulge) > tolerance:
+            return None
+        pieces.append((end, bulge))
+
+    return pieces
+
+
+def fit_biarcs(points, tangents, tolerance):
+    """
+    把曲线采样点拟合成首尾相接的双圆弧, 返回 (n, 3) 的顶点数组 (x, y, 凸度)。
+    每一组双圆弧尽可能覆盖更多的采样点: 先倍增找到拟合失败的长度, 再二分。
+    两个相邻采样点之间都无法拟合时退化为直线。
+    """
+    vertices = [(points[0][0], points[0][1])]
+    bulges = []
+    m = len(points) - 1
+    i = 0
+
+    def fit(length):
+        window = points[i : i + length + 1]
+        return fit_biarc(window, tangents[i], tangents[i + length], tolerance)
+
+    while i < m:
+        good, bad, best = 0, None, None
+        length = 1
+        while True:
+            pieces = fit(length)
+            if pieces is None:
+                bad = length
+                break
+            good, best = length, pieces
+            if length == m - i:
+                break
+            length = min(length * 2, m - i)
+
+        while bad is not None and good > 0 and bad - good > 1:
+            length = (good + bad) // 2
+            pieces = fit(length)
+            if pieces is None:
+                bad = length
+            else:
+                good, best = length, pieces
+
+        if best is None:
+            good, best = 1, [(points[i + 1], 0.0)]
+
+        for end, bulge in best:
+            bulges.append(bulge)
+            vertices.append((end[0], end[1]))
+        i += good
+
+    # 最后一个顶点的凸度没有意义, 与 LWPOLYLINE 一样置 0
+    bulges.append(0.0)
+    xy = np.array(vertices, dtype=np.float64)
+    return np.column_stack([xy, np.array(bulges, dtype=np.float64)])
+
+
+def unit_tangents(derivatives, points):
+    # 导数为 0 的采样点(例如重合的控制点)用相邻弦的方向代替
+    lengths = np.hypot(derivatives[:, 0], derivatives[:, 1])
+    chords = np.gradient(points, axis=0)
+    degenerate = lengths < 1e-12
+    derivatives = np.where(degenerate[:, None], chords, derivatives)
+    lengths = np.hypot(derivatives[:, 0], derivatives[:, 1])
+    return derivatives / np.maximum(lengths, 1e-300)[:, None]
+
+
+def sample_count(count):
+    return int(min(max(count, MIN_SAMPLES), MAX_SAMPLES))
+
+
+def ellipse_samples(ellipse, tolerance):
+    center = np.array(ellipse.dxf.center)[0:2]
+    major = np.array(ellipse.dxf.major_axis)[0:2]
+    # minor_axis 已经按拉伸方向换算到世界坐标, 拉伸方向为 -Z 时走向自动反转
+    minor = np.array(ellipse.minor_axis)[0:2]
+    span = ellipse.construction_tool().param_span
+
+    # 按最小曲率半径 b^2/a 估算步长, 使相邻采样点的弦高不超过 tolerance
+    a = max(math.hypot(*major), 1e-12)
+    b = max(math.hypot(*minor), 1e-12)
+    step = math.sqrt(8.0 * tolerance * b * b / (a * a * a))
+    count = sample_count(math.ceil(span / step))
+
+    params = ellipse.dxf.start_param + np.linspace(0.0, span, count + 1)
+    cos = np.cos(params)[:, None]
+    sin = np.sin(params)[:, None]
+    points = center + cos * major + sin * minor
+    derivatives = -sin * major + cos * minor
+
+    return (points, unit_tangents(derivatives, points))
+
+
+def spline_samples(spline, tolerance):
+    bspline = spline.construction_tool()
+    count = sample_count(4 * len(list(bspline.flattening(tolerance))))
+
+    points = []
+    derivatives = []
+    for point, derivative in bspline.derivatives(bspline.params(count), n=1):
+        points.append((point.x, point.y))
+        derivatives.append((derivative.x, derivative.y))
+    points = np.array(points, dtype=np.float64)
+    derivatives = np.array(derivatives, dtype=np.float64)
+
+    return (points, unit_tangents(derivatives, points))
+
+
+def curve_vertices(entity, tolerance=CURVE_TOLERANCE):
+    """把 ELLIPSE 或 SPLINE 拟合成 LWPOLYLINE 形式的顶点数组 (x, y, 凸度)"""
+    if entity.dxftype() == "ELLIPSE":
+        points, tangents = ellipse_samples(entity, tolerance)
+    else:
+        points, tangents = spline_samples(entity, tolerance)
+
+    return fit_biarcs(points, tangents, tolerance)
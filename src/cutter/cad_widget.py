@@ -211,6 +211,15 @@ class DxfEntityScence(QGraphicsScene):
             for vertex in entity[1:]:
                 path.lineTo(vertex[0], vertex[1])
 
+            item = QGraphicsPathItem(path)
+        elif entity.dxftype() == "SPLINE":
+            path = QPainterPath()
+            points = list(entity.flattening(0.01))
+            path.moveTo(points[0].x, points[0].y)
+
+            for point in points[1:]:
+                path.lineTo(point.x, point.y)
+
             item = QGraphicsPathItem(path)
         else:
             print("skip entity type:", entity.dxftype())
@@ -0,0 +1,252 @@
+import math
+
+import numpy as np
+
+from cutter.geometry import LINE, Contour
+from cutter.lead_in import LEAD_IN_LENGTH
+
+# 判断两条直线重合的方向容差(弧度)和距离容差(mm)
+ANGLE_TOLERANCE = 1e-4
+OFFSET_TOLERANCE = 0.001
+# 重合部分短于该长度时不处理(mm)
+MIN_OVERLAP = 0.01
+
+
+class SharedEdge:
+    """
+    后切的轮廓 contour 的第 segment 段上, 参数 [t0, t1] 部分(0 为起点, 1 为终点)
+    与先切的轮廓 other 重合, 不需要再切一次。
+    """
+
+    def __init__(self, contour, segment, t0, t1, other) -> None:
+        self.contour = contour
+        self.segment = segment
+        self.t0 = t0
+        self.t1 = t1
+        self.other = other
+
+
+def line_frames(starts, ends):
+    """
+    直线的方向角 (0 ~ pi)、到原点的有向距离以及起止点沿方向的投影。
+    方向相反的直线得到相同的方向角和距离, 可以放进同一个索引格子。
+    """
+    delta = ends - starts
+    angles = np.arctan2(delta[:, 1], delta[:, 0]) % math.pi
+    # 接近 pi 的方向折回到 0 附近, 与接近 0 的方向落在相邻的格子里
+    angles = np.where(angles > math.pi - ANGLE_TOLERANCE, angles - math.pi, angles)
+
+    directions = np.column_stack([np.cos(angles), np.sin(angles)])
+    normals = np.column_stack([-directions[:, 1], directions[:, 0]])
+    offsets = np.sum(normals * starts, axis=1)
+    t_starts = np.sum(directions * starts, axis=1)
+    t_ends = np.sum(directions * ends, axis=1)
+    return (angles, offsets, t_starts, t_ends)
+
+
+def find_shared_edges(contours):
+    """
+    找出不同轮廓之间重合的直线段。直线按 (方向角, 到原点的距离) 量化后放进哈希格子,
+    只有同一格子或相邻格子里的直线才可能重合。contours 按切割顺序排列,
+    重合部分记在后切的轮廓上。
+    """
+    owners = []
+    starts = []
+    ends = []
+    for c, contour in enumerate(contours):
+        for k in np.flatnonzero(contour.kinds == LINE).tolist():
+            owners.append((c, k))
+            starts.append(contour.points[k])
+            ends.append(contour.points[k + 1])
+
+    if not owners:
+        return []
+
+    starts = np.array(starts, dtype=np.float64)
+    ends = np.array(ends, dtype=np.float64)
+    angles, offsets, t_starts, t_ends = line_frames(starts, ends)
+    keys = np.column_stack(
+        [
+            np.floor(angles / ANGLE_TOLERANCE),
+            np.floor(offsets / OFFSET_TOLERANCE),
+        ]
+    ).astype(np.int64)
+
+    cells = {}
+    for n, key in enumerate(map(tuple, keys.tolist())):
+        cells.setdefault(key, []).append(n)
+
+    shared = []
+    for n, (ka, ko) in enumerate(keys.tolist()):
+        c, k = owners[n]
+        lo = min(t_starts[n], t_ends[n])
+        hi = max(t_starts[n], t_ends[n])
+
+        for da in (-1, 0, 1):
+            for do in (-1, 0, 1):
+                for m in cells.get((ka + da, ko + do), ()):
+                    other = owners[m][0]
+                    # 只记录在更早切割的轮廓上已经切过的部分
+                    if other >= c:
+                        continue
+                    if abs(angles[m] - angles[n]) > ANGLE_TOLERANCE:
+                        continue
+                    if abs(offsets[m] - offsets[n]) > OFFSET_TOLERANCE:
+                        continue
+
+                    a = max(lo, min(t_starts[m], t_ends[m]))
+                    b = min(hi, max(t_starts[m], t_ends[m]))
+                    if b - a < MIN_OVERLAP:
+                        continue
+
+                    # 投影区间换算成本段从起点到终点的参数
+                    t0 = (a - t_starts[n]) / (t_ends[n] - t_starts[n])
+                    t1 = (b - t_starts[n]) / (t_ends[n] - t_starts[n])
+                    shared.append(SharedEdge(c, k, min(t0, t1), max(t0, t1), other))
+
+    return shared
+
+
+def split_shared_edges(contours, shared):
+    """
+    去掉每个轮廓上已经切过的部分, 剩下的部分按走刀方向拆成不闭合的路径。
+    没有重合部分的轮廓原样返回。
+
+    返回 (paths, sources, approaches, 去掉的总长度): sources[k] 是 paths[k]
+    所属原轮廓的序号; approaches[k] 是不闭合路径的下刀点, 在起点之前已切过的
+    重合段上往回最多 LEAD_IN_LENGTH 处, 那里的材料已被先切的轮廓切穿; 闭合轮廓为 None。
+    """
+    removed = {}
+    for edge in shared:
+        removed.setdefault(edge.contour, {}).setdefault(edge.segment, []).append(
+            (edge.t0, edge.t1)
+        )
+
+    paths = []
+    sources = []
+    approaches = []
+    total = 0.0
+    for c, contour in enumerate(contours):
+        if c not in removed:
+            paths.append(contour)
+            sources.append(c)
+            approaches.append(None)
+            continue
+
+        pieces, length = contour_pieces(contour, removed[c])
+        for path, approach in chain_pieces(pieces):
+            paths.append(path)
+            sources.append(c)
+            approaches.append(approach)
+        total += length
+
+    return (paths, sources, approaches, total)
+
+
+def merge_intervals(intervals):
+    merged = []
+    for t0, t1 in sorted(intervals):
+        if merged and t0 <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], t1)
+        else:
+            merged.append([t0, t1])
+    return merged
+
+
+def contour_pieces(contour, removed):
+    """
+    把轮廓拆成 (类型, 起点, 终点, 圆心, 方向, 是否已切过) 的小段,
+    返回 (小段列表, 已切过部分的长度)。
+    """
+    pieces = []
+    length = 0.0
+    points = contour.points
+    for k in range(len(contour)):
+        kind = int(contour.kinds[k])
+        start = points[k]
+        end = points[k + 1]
+        center = contour.centers[k]
+        ccw = bool(contour.ccw[k])
+        if k not in removed:
+            pieces.append((kind, start, end, center, ccw, False))
+            continue
+
+        # 直线段按参数切开, 重合区间之间的部分保留
+        t = 0.0
+        for t0, t1 in merge_intervals(removed[k]):
+            t0 = min(max(t0, 0.0), 1.0)
+            t1 = min(max(t1, 0.0), 1.0)
+            if t0 > t:
+                pieces.append(
+                    (
+                        kind,
+                        lerp(start, end, t),
+                        lerp(start, end, t0),
+                        center,
+                        ccw,
+                        False,
+                    )
+                )
+            pieces.append(
+                (kind, lerp(start, end, t0), lerp(start, end, t1), center, ccw, True)
+            )
+            length += (t1 - t0) * float(np.hypot(*(end - start)))
+            t = t1
+        if t < 1.0:
+            pieces.append((kind, lerp(start, end, t), end, center, ccw, False))
+
+    return (pieces, length)
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+
+def chain_pieces(pieces):
+    """
+    从一个已切过的小段之后开始, 把连续的未切小段连成路径,
+    返回 [(路径, 下刀点), ...], 下刀点在路径起点之前最近的已切过的小段上。
+    """
+    n = len(pieces)
+    first = next((i for i, p in enumerate(pieces) if p[5]), None)
+    if first is None:
+        return []
+
+    paths = []
+    current = []
+    approach = None
+    last_cut = pieces[first]
+    for i in range(first + 1, first + 1 + n):
+        kind, start, end, center, ccw, cut = pieces[i % n]
+        if cut or np.hypot(*(end - start)) < 1e-9:
+            if current:
+                paths.append((pieces_contour(current), approach))
+                current = []
+            if cut:
+                last_cut = pieces[i % n]
+            continue
+        if not current:
+            approach = approach_point(last_cut)
+        current.append((kind, start, end, center, ccw))
+
+    if current:
+        paths.append((pieces_contour(current), approach))
+    return paths
+
+
+def approach_point(piece):
+    # 已切过的直线小段从终点往回 LEAD_IN_LENGTH, 小段较短时取它的起点
+    start, end = piece[1], piece[2]
+    length = float(np.hypot(*(end - start)))
+    t = min(1.0, LEAD_IN_LENGTH / length) if length > 0 else 0.0
+    point = end + (start - end) * t
+    return (float(point[0]), float(point[1]))
+
+
+def pieces_contour(pieces):
+    return Contour(
+        np.array([p[0] for p in pieces], dtype=np.int8),
+        np.array([p[1] for p in pieces] + [pieces[-1][2]], dtype=np.float64),
+        np.array([p[3] for p in pieces], dtype=np.float64).reshape(-1, 2),
+        np.array([p[4] for p in pieces], dtype=bool),
+    )
@@ -1,10 +1,25 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from cutter.models import User
 
 VERSION: str = "1.0.0"
 ROLE_NAMES: Dict[str, str] = {"0": "Admin", "1": "PM", "2": "PE", "3": "OP"}
-SUPPORTED_ENTITY_TYPES: List[str] = ["LINE", "ARC", "CIRCLE", "LWPOLYLINE"]
+SUPPORTED_ENTITY_TYPES: List[str] = [
+    "LINE",
+    "ARC",
+    "CIRCLE",
+    "LWPOLYLINE",
+    "ELLIPSE",
+    "SPLINE",
+]
 COLUMN_NAME_MAPPING: List[str] = ["name", "department", "role", "created_at"]
 CURRENT_USER: Optional[User] = None
 PLC_ADDR: str = "169.254.54.209.1.1"
 ALIGNMENT: Dict[str, Optional[float]] = {"x": None, "y": None, "z": None}
+# 机床各轴的行程范围(mm), 即 TwinCAT 中各轴 NC 参数的软件限位, 生成的程序不能超出。
+# None 表示该轴没有配置, 不做检查; 启动时由 database.load_machine_travel
+# 从数据目录下的 machine.json 读取, 格式为 {"travel": {"x": [0, 1300], ...}}
+MACHINE_TRAVEL: Dict[str, Optional[Tuple[float, float]]] = {
+    "x": None,
+    "y": None,
+    "z": None,
+}
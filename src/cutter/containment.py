@@ -0,0 +1,203 @@
+import itertools
+import math
+
+import numpy as np
+
+from cutter.geometry import ARC
+from cutter.travel import plan_travel_order
+
+# 圆弧展开成折线时的弦高误差(mm)
+FLATTEN_TOLERANCE = 0.01
+# 外包框最多登记的格子数, 更大的外包框每次查询都直接检查
+MAX_BOX_CELLS = 64
+
+
+def contour_polygon(contour, tolerance=FLATTEN_TOLERANCE):
+    """把轮廓展开成折线顶点 (n, 2), 不重复首点, 用于面积和点在多边形内的判断"""
+    if not np.any(contour.kinds == ARC):
+        # 没有圆弧时就是轮廓的顶点
+        return contour.points[:-1].astype(np.float64)
+
+    points = contour.points.tolist()
+    centers = contour.centers.tolist()
+    ccw = contour.ccw.tolist()
+    polygon = []
+
+    for k, kind in enumerate(contour.kinds.tolist()):
+        polygon.append(points[k])
+        if kind != ARC:
+            continue
+
+        (sx, sy), (ex, ey), (cx, cy) = points[k], points[k + 1], centers[k]
+        radius = math.hypot(sx - cx, sy - cy)
+        a1 = math.atan2(sy - cy, sx - cx)
+        a2 = math.atan2(ey - cy, ex - cx)
+        sweep = (a2 - a1) % (2 * math.pi) if ccw[k] else -((a1 - a2) % (2 * math.pi))
+        if sweep == 0.0:
+            sweep = 2 * math.pi if ccw[k] else -2 * math.pi
+
+        step = 2 * math.acos(max(-1.0, 1 - tolerance / max(radius, tolerance)))
+        n = min(max(int(math.ceil(abs(sweep) / step)), 2), 256)
+        for t in range(1, n):
+            angle = a1 + sweep * t / n
+            polygon.append(
+                (cx + radius * math.cos(angle), cy + radius * math.sin(angle))
+            )
+
+    return np.array(polygon, dtype=np.float64).reshape(-1, 2)
+
+
+def signed_area(polygon):
+    # 逆时针为正
+    x = polygon[:, 0]
+    y = polygon[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def point_in_polygon(point, polygon):
+    # 射线法, 向 +x 方向数穿过的边数
+    px, py = point
+    x1 = polygon[:, 0]
+    y1 = polygon[:, 1]
+    x2 = np.roll(x1, -1)
+    y2 = np.roll(y1, -1)
+    crosses = (y1 > py) != (y2 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+    return bool(np.count_nonzero(crosses & (px < x)) % 2)
+
+
+class BoxIndex:
+    """
+    外包框的网格索引。每个外包框登记到它覆盖的所有格子里,
+    查询一个点时只需要检查该点所在格子里的外包框。
+    覆盖格子数超过 MAX_BOX_CELLS 的大外包框(例如围住整张板的外轮廓)不登记到格子里,
+    单独放在 large 中, 每次查询都检查。
+    """
+
+    def __init__(self, boxes) -> None:
+        self.boxes = boxes
+        sizes = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        # 格子边长取外包框尺寸的中位数, 大多数外包框只落在几个格子里
+        self.cell = max(float(np.median(sizes)) if len(sizes) else 1.0, 1e-6)
+        self.cells = {}
+        self.large = []
+
+        for i, (x0, y0, x1, y1) in enumerate(boxes.tolist()):
+            kx0, ky0 = self.cell_key(x0, y0)
+            kx1, ky1 = self.cell_key(x1, y1)
+            if (kx1 - kx0 + 1) * (ky1 - ky0 + 1) > MAX_BOX_CELLS:
+                self.large.append(i)
+                continue
+            for kx in range(kx0, kx1 + 1):
+                for ky in range(ky0, ky1 + 1):
+                    self.cells.setdefault((kx, ky), []).append(i)
+
+    def cell_key(self, x, y):
+        return (math.floor(x / self.cell), math.floor(y / self.cell))
+
+    def query(self, point):
+        """返回外包框包含 point 的所有序号"""
+        x, y = point
+        found = []
+        for i in itertools.chain(self.cells.get(self.cell_key(x, y), ()), self.large):
+            x0, y0, x1, y1 = self.boxes[i]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                found.append(i)
+        return found
+
+    def overlapping(self, low, high):
+        """返回外包框与矩形 [low, high] 相交的所有序号, 从小到大排列"""
+        kx0, ky0 = self.cell_key(*low)
+        kx1, ky1 = self.cell_key(*high)
+        if (kx1 - kx0 + 1) * (ky1 - ky0 + 1) > MAX_BOX_CELLS:
+            # 查询范围很大时直接比较全部外包框
+            candidates = range(len(self.boxes))
+        else:
+            candidates = set(self.large)
+            for kx in range(kx0, kx1 + 1):
+                for ky in range(ky0, ky1 + 1):
+                    candidates.update(self.cells.get((kx, ky), ()))
+
+        (lx, ly), (hx, hy) = low, high
+        found = []
+        for i in sorted(candidates):
+            x0, y0, x1, y1 = self.boxes[i]
+            if x0 <= hx and y0 <= hy and x1 >= lx and y1 >= ly:
+                found.append(i)
+        return found
+
+
+def containment_parents(polygons):
+    """
+    计算每个闭合轮廓的直接外层轮廓, 没有外层时为 -1。
+    外层轮廓的外包框必须包含本轮廓的外包框, 并且本轮廓上的点在外层多边形内,
+    满足条件的轮廓中面积最小的就是直接外层。
+    """
+    boxes = np.array(
+        [(*p.min(axis=0), *p.max(axis=0)) for p in polygons], dtype=np.float64
+    ).reshape(-1, 4)
+    areas = [abs(signed_area(p)) for p in polygons]
+    index = BoxIndex(boxes)
+    parents = []
+
+    for i, polygon in enumerate(polygons):
+        # 取第一条边的中点, 避开相邻轮廓可能共用的顶点
+        point = tuple(((polygon[0] + polygon[1 % len(polygon)]) / 2).tolist())
+        x0, y0, x1, y1 = boxes[i]
+        parent = -1
+
+        for j in index.query(point):
+            if j == i or areas[j] <= areas[i]:
+                continue
+            bx0, by0, bx1, by1 = boxes[j]
+            if not (bx0 <= x0 and by0 <= y0 and x1 <= bx1 and y1 <= by1):
+                continue
+            if parent >= 0 and areas[j] >= areas[parent]:
+                continue
+            if point_in_polygon(point, polygons[j]):
+                parent = j
+
+        parents.append(parent)
+
+    return parents
+
+
+def containment_depths(parents):
+    depths = []
+    for i in range(len(parents)):
+        depth = 0
+        p = parents[i]
+        while p >= 0:
+            depth += 1
+            p = parents[p]
+        depths.append(depth)
+
+    return depths
+
+
+def cut_order(start_points, parents, origin=(0.0, 0.0)):
+    """
+    按包含关系安排切割顺序: 每个轮廓的内层轮廓都在它之前切完,
+    同一层的轮廓之间按空行程最短排序。
+    """
+    children = [[] for _ in parents]
+    roots = []
+    for i, p in enumerate(parents):
+        (children[p] if p >= 0 else roots).append(i)
+
+    order = []
+    position = origin
+
+    def visit(nodes):
+        nonlocal position
+        points = [start_points[i] for i in nodes]
+        for k in plan_travel_order(points, position):
+            i = nodes[k]
+            if children[i]:
+                visit(children[i])
+            order.append(i)
+            position = start_points[i]
+
+    visit(roots)
+    return order
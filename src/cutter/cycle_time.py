@@ -0,0 +1,214 @@
+import numpy as np
+
+from cutter.geometry import arc_sweeps
+from cutter.toolpath import CCW, RAPID, parse_toolpath
+
+CUT = 1
+
+
+class MachineLimits:
+    """
+    估算加工时间用的机床参数。
+
+    速度单位 mm/min, 与 G 代码的 F 值一致; 加速度单位 mm/s^2。
+    三个元素依次对应 X, Y, Z 轴。
+    """
+
+    def __init__(
+        self,
+        max_velocity=(10000.0, 10000.0, 3000.0),
+        max_acceleration=(500.0, 500.0, 300.0),
+        default_feed=400.0,
+    ) -> None:
+        self.max_velocity = max_velocity
+        self.max_acceleration = max_acceleration
+        # 程序中出现第一个 F 之前的进给速度
+        self.default_feed = default_feed
+
+
+class Moves:
+    """
+    运动段的数组形式, 第 k 个元素对应第 k 段, 零长度的段已经去掉。
+    velocities 和 accelerations 是本段允许的最大速度(mm/s)和加速度(mm/s^2),
+    entries 和 exits 是起点和终点处的单位切向 (n, 3), 用来计算拐角速度。
+    """
+
+    def __init__(
+        self, kinds, lengths, velocities, accelerations, entries, exits
+    ) -> None:
+        self.kinds = kinds
+        self.lengths = lengths
+        self.velocities = velocities
+        self.accelerations = accelerations
+        self.entries = entries
+        self.exits = exits
+
+    def __len__(self):
+        return len(self.kinds)
+
+
+class CycleTime:
+    """加工时间估算结果, 单位秒"""
+
+    def __init__(self, cut=0.0, rapid=0.0, cut_length=0.0, rapid_length=0.0):
+        self.cut = cut
+        self.rapid = rapid
+        self.cut_length = cut_length
+        self.rapid_length = rapid_length
+
+    @property
+    def total(self):
+        return self.cut + self.rapid
+
+    def __str__(self):
+        return "{} (切割 {}, 空行程 {})".format(
+            format_duration(self.total),
+            format_duration(self.cut),
+            format_duration(self.rapid),
+        )
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}小时{minutes}分{seconds}秒"
+    return f"{minutes}分{seconds}秒"
+
+
+def axis_limit(limits, directions):
+    # 沿 directions (n, 3) 直线运动时, 受各轴限制的合成速度(或加速度)上限
+    components = np.abs(directions)
+    with np.errstate(divide="ignore"):
+        values = np.where(components > 1e-12, np.asarray(limits) / components, np.inf)
+    return values.min(axis=1)
+
+
+def toolpath_moves(toolpath, limits):
+    """由 parse_toolpath 的结果计算每段的长度、速度和加速度上限以及起止切向"""
+    vx, vy, vz = (v / 60.0 for v in limits.max_velocity)
+    ax, ay, az = limits.max_acceleration
+
+    starts = toolpath.starts
+    ends = toolpath.ends
+    delta = ends - starts
+    lengths = np.sqrt(np.sum(delta**2, axis=1))
+    # 程序中出现第一个 F 之前使用默认进给
+    feeds = np.where(toolpath.feeds > 0, toolpath.feeds, limits.default_feed) / 60.0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        directions = delta / lengths[:, None]
+    directions[lengths < 1e-9] = 0.0
+    entries = directions.copy()
+    exits = directions.copy()
+    velocities = axis_limit((vx, vy, vz), directions)
+    velocities = np.where(
+        toolpath.motions == RAPID, velocities, np.minimum(velocities, feeds)
+    )
+    accelerations = axis_limit((ax, ay, az), directions)
+
+    # G02/G03, 圆心由 I/J 给出, 终点与起点重合时为整圆
+    is_arc = toolpath.is_arc
+    if is_arc.any():
+        centers = toolpath.centers[is_arc]
+        ccw = toolpath.motions[is_arc] == CCW
+        radii, a1, sweeps = arc_sweeps(
+            starts[is_arc, :2], ends[is_arc, :2], centers, ccw
+        )
+        lengths[is_arc] = np.hypot(radii * np.abs(sweeps), delta[is_arc, 2])
+
+        # 圆弧上两轴同时运动, 取较小的轴限制, 并限制向心加速度
+        acceleration = min(ax, ay)
+        accelerations[is_arc] = acceleration
+        velocities[is_arc] = np.minimum(
+            np.minimum(min(vx, vy), feeds[is_arc]), np.sqrt(acceleration * radii)
+        )
+        entries[is_arc] = arc_tangents(centers, starts[is_arc, :2], ccw)
+        exits[is_arc] = arc_tangents(centers, ends[is_arc, :2], ccw)
+
+    keep = lengths >= 1e-9
+    kinds = np.where(toolpath.motions == RAPID, RAPID, CUT)
+    return Moves(
+        kinds[keep],
+        lengths[keep],
+        velocities[keep],
+        accelerations[keep],
+        entries[keep],
+        exits[keep],
+    )
+
+
+def arc_tangents(centers, points, ccw):
+    radial = points - centers
+    tangents = np.column_stack([-radial[:, 1], radial[:, 0], np.zeros(len(radial))])
+    tangents[~ccw] *= -1
+    lengths = np.hypot(tangents[:, 0], tangents[:, 1])
+    return tangents / np.where(lengths > 0, lengths, 1.0)[:, None]
+
+
+def junction_velocities(moves):
+    # 相邻两段切割之间不停顿, 拐角越大速度越低, 原路折返时为 0; 快速定位前后都停止
+    cos = np.sum(moves.exits[:-1] * moves.entries[1:], axis=1)
+    velocities = np.minimum(moves.velocities[:-1], moves.velocities[1:])
+    velocities = velocities * np.maximum(0.0, (1.0 + cos) / 2.0)
+    is_cut = moves.kinds == CUT
+    return np.where(is_cut[:-1] & is_cut[1:], velocities, 0.0)
+
+
+def move_times(moves, v0, v1):
+    # 梯形速度曲线: 加速到最大速度, 匀速, 再减速; 距离不够时为三角形
+    a = moves.accelerations
+    v = moves.velocities
+    length = moves.lengths
+    accelerate = (v * v - v0 * v0) / (2 * a)
+    decelerate = (v * v - v1 * v1) / (2 * a)
+    cruise = length - accelerate - decelerate
+    trapezoid = (v - v0) / a + (v - v1) / a + np.maximum(cruise, 0.0) / v
+
+    peak = np.sqrt(np.maximum((2 * a * length + v0 * v0 + v1 * v1) / 2, 0.0))
+    triangle = (peak - v0) / a + (peak - v1) / a
+    return np.where(cruise >= 0, trapezoid, triangle)
+
+
+def limit_speeds(squared, gains):
+    """
+    速度的平方 s 满足 s[k + 1] <= s[k] + gains[k], 其中 gains[k] = 2 * a * L。
+    逐段递推等价于 s[m] = min(squared[i] + C[m] - C[i]) (i <= m), C 是 gains 的前缀和,
+    用累计最小值一次算出, 不逐段循环。
+    """
+    cumulative = np.concatenate([[0.0], np.cumsum(gains)])
+    return np.minimum.accumulate(squared - cumulative) + cumulative
+
+
+def simulate(moves):
+    """前向和后向两遍计算每段的起止速度, 再按梯形速度曲线累加时间"""
+    n = len(moves)
+    result = CycleTime()
+    if n == 0:
+        return result
+
+    speeds = np.zeros(n + 1)
+    speeds[1:n] = junction_velocities(moves)
+    gains = 2 * moves.accelerations * moves.lengths
+    squared = limit_speeds(speeds**2, gains)
+    squared = limit_speeds(squared[::-1], gains[::-1])[::-1]
+    speeds = np.sqrt(np.maximum(squared, 0.0))
+
+    seconds = move_times(moves, speeds[:-1], speeds[1:])
+    is_rapid = moves.kinds == RAPID
+    result.rapid = float(seconds[is_rapid].sum())
+    result.rapid_length = float(moves.lengths[is_rapid].sum())
+    result.cut = float(seconds[~is_rapid].sum())
+    result.cut_length = float(moves.lengths[~is_rapid].sum())
+    return result
+
+
+def estimate_cycle_time(lines, limits=None):
+    """
+    估算 G 代码的加工时间。lines 可以是整段文本, 也可以是 G 代码行的可迭代对象,
+    例如 GCode.iter_lines()。解析使用与预览、校验相同的 parse_toolpath。
+    """
+    if limits is None:
+        limits = MachineLimits()
+
+    return simulate(toolpath_moves(parse_toolpath(lines), limits))
@@ -1,8 +1,10 @@
 from datetime import datetime
+import json
 import os
 from pathlib import Path
 from typing import Optional, Tuple
 from qtpy.QtSql import QSqlDatabase, QSqlQuery
+from cutter.consts import MACHINE_TRAVEL
 from cutter.models import Recipe, User
 
 
@@ -10,6 +12,10 @@ local_app_data = Path(os.environ["LOCALAPPDATA"])
 cutter_data_path = local_app_data / "cmp-cutter"
 database_path = cutter_data_path / "data.db"
 DXF_PATH = cutter_data_path / "dxf"
+# 生成的 G 代码缓存, 与 dxf 目录放在一起
+NC_CACHE_PATH = cutter_data_path / "nc"
+# 机床参数配置, 目前只有各轴行程
+MACHINE_CONFIG_PATH = cutter_data_path / "machine.json"
 
 if not os.path.exists(cutter_data_path):
     os.makedirs(cutter_data_path)
@@ -22,6 +28,57 @@ DB_CONN.setDatabaseName(str(database_path))
 DB_CONN.open()
 
 
+def travel_limits(limits):
+    # machine.json 中一个轴的行程 [low, high], 格式不对或 low >= high 时返回 None
+    if not isinstance(limits, list) or len(limits) != 2:
+        return None
+    try:
+        low, high = float(limits[0]), float(limits[1])
+    except (TypeError, ValueError):
+        return None
+    return (low, high) if low < high else None
+
+
+def load_machine_travel():
+    """
+    从 machine.json 读取各轴行程, 填入 consts.MACHINE_TRAVEL。
+    文件不存在或没有配置的轴保持 None, 生成和检查程序时不限制该轴;
+    文件无法解析或某个轴配置错误时打印错误, 该轴同样保持 None, 不影响启动。
+    """
+    if not os.path.exists(MACHINE_CONFIG_PATH):
+        print(f"{MACHINE_CONFIG_PATH} not found, machine travel is not checked")
+        return
+
+    try:
+        with open(MACHINE_CONFIG_PATH, encoding="utf-8") as file:
+            config = json.load(file)
+    except (OSError, ValueError) as e:
+        # json.JSONDecodeError 和编码错误都是 ValueError
+        print(f"read {MACHINE_CONFIG_PATH} error: {e}, machine travel is not checked")
+        return
+
+    travel = config.get("travel", {}) if isinstance(config, dict) else None
+    if not isinstance(travel, dict):
+        print(
+            f"{MACHINE_CONFIG_PATH}: travel is not an object, "
+            "machine travel is not checked"
+        )
+        return
+
+    for axis in MACHINE_TRAVEL:
+        if travel.get(axis) is None:
+            continue
+        limits = travel_limits(travel[axis])
+        if limits is None:
+            print(
+                f"{MACHINE_CONFIG_PATH}: invalid {axis} travel {travel[axis]!r}, "
+                f"{axis} is not checked"
+            )
+            continue
+        MACHINE_TRAVEL[axis] = limits
+    print(f"machine travel: {MACHINE_TRAVEL}")
+
+
 def init_db():
     query = QSqlQuery(DB_CONN)
     tables = DB_CONN.tables()
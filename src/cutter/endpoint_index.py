@@ -0,0 +1,38 @@
+import math
+
+
+class EndpointIndex:
+    """
+    按容差量化的哈希网格, 用于按端点查找线段。
+
+    网格边长等于容差, 所以与查询点距离小于容差的端点一定落在
+    查询点所在格子及其周围 8 个格子里。
+    """
+
+    def __init__(self, epsilon=0.001):
+        self.epsilon = epsilon
+        self.cells = {}
+        self.count = 0
+
+    def cell_key(self, x, y):
+        return (math.floor(x / self.epsilon), math.floor(y / self.epsilon))
+
+    def add(self, point, item):
+        key = self.cell_key(point[0], point[1])
+        self.cells.setdefault(key, []).append((self.count, point[0], point[1], item))
+        self.count += 1
+
+    def query(self, point):
+        """返回所有与 point 距离小于容差的条目, 按插入顺序排列"""
+        x, y = point[0], point[1]
+        kx, ky = self.cell_key(x, y)
+        found = []
+
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for order, px, py, item in self.cells.get((kx + dx, ky + dy), ()):
+                    if math.hypot(px - x, py - y) < self.epsilon:
+                        found.append((order, item))
+
+        found.sort(key=lambda x: x[0])
+        return [item for _, item in found]
@@ -0,0 +1,74 @@
+import numpy as np
+
+from cutter.geometry import ARC
+
+# 规划进给用的加速度(mm/s^2), 与 MachineLimits 的 X/Y 轴默认值一致
+FEED_ACCELERATION = 500.0
+# 进给速度取整的步长(mm/min), 相近的进给合并成一个值, 减少 F 指令
+FEED_STEP = 10.0
+
+
+def segment_tangents(contour):
+    """每段起点和终点处的单位切向 (n, 2), 圆弧的切向与走刀方向一致"""
+    starts = contour.points[:-1]
+    ends = contour.points[1:]
+    entry = ends - starts
+    exit = ends - starts
+
+    is_arc = contour.kinds == ARC
+    if is_arc.any():
+        sign = np.where(contour.ccw[is_arc], 1.0, -1.0)[:, None]
+        for tangents, points in ((entry, starts), (exit, ends)):
+            radial = points[is_arc] - contour.centers[is_arc]
+            tangents[is_arc] = sign * np.column_stack([-radial[:, 1], radial[:, 0]])
+
+    for tangents in (entry, exit):
+        lengths = np.hypot(tangents[:, 0], tangents[:, 1])
+        tangents /= np.where(lengths > 0, lengths, 1.0)[:, None]
+
+    return (entry, exit)
+
+
+def plan_feeds(
+    contour,
+    min_feed,
+    max_feed,
+    acceleration=FEED_ACCELERATION,
+    step=FEED_STEP,
+    closed=True,
+):
+    """
+    按拐角和圆弧半径规划轮廓每一段的进给速度(mm/min)。
+
+    - 拐角速度与 cycle_time 的估算一致, 为 max_feed * (1 + cos) / 2, 原路折返时为 0;
+    - 圆弧上的向心加速度不超过 acceleration, 即速度不超过 sqrt(acceleration * r);
+    - 短线段从两端的拐角速度出发加速不到 max_feed 时, 取能达到的最高速度。
+
+    closed 为假时(共边切割拆出的路径)没有首尾相连的拐角, 起点从静止加速, 到终点减速停止。
+    结果按 step 向下取整, 并限制在 [min_feed, max_feed] 之间。
+    """
+    n = len(contour)
+    max_speed = max_feed / 60.0
+    limits = np.full(n, max_speed)
+
+    is_arc = contour.kinds == ARC
+    if is_arc.any():
+        radii = np.hypot(*(contour.points[:-1][is_arc] - contour.centers[is_arc]).T)
+        limits[is_arc] = np.minimum(max_speed, np.sqrt(acceleration * radii))
+
+    # 第 k 个顶点是第 k-1 段和第 k 段的拐角, 闭合轮廓的第 0 个顶点连接最后一段
+    entry, exit = segment_tangents(contour)
+    cos = np.sum(np.roll(exit, 1, axis=0) * entry, axis=1)
+    corners = max_speed * np.maximum(0.0, (1.0 + cos) / 2.0)
+    corners = np.minimum(corners, np.minimum(limits, np.roll(limits, 1)))
+    if not closed:
+        corners[0] = 0.0
+    v_in = corners
+    v_out = np.roll(corners, -1)
+
+    lengths = contour.lengths()
+    peaks = np.sqrt((2 * acceleration * lengths + v_in**2 + v_out**2) / 2)
+    speeds = np.minimum(limits, peaks) * 60.0
+
+    feeds = np.floor(speeds / step) * step
+    return np.clip(feeds, min_feed, max_feed).astype(int).tolist()
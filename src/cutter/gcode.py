@@ -1,156 +1,581 @@
-from ezdxf.math import BoundingBox, Vec3
-from ezdxf import bbox
-from cutter.consts import ALIGNMENT
+from ezdxf.math import Vec3
+from cutter.arc_fit import fit_arcs
+from cutter.common_line import find_shared_edges, split_shared_edges
+from cutter.consts import ALIGNMENT, MACHINE_TRAVEL
+from cutter.containment import (
+    containment_depths,
+    containment_parents,
+    contour_polygon,
+    cut_order,
+    signed_area,
+)
+from cutter.cycle_time import estimate_cycle_time
+from cutter.endpoint_index import EndpointIndex
+from cutter.feed import plan_feeds
+from cutter.geometry import ARC, CIRCLE, LINE, Contour, segment_bounds
+from cutter.heal import heal_gaps
+from cutter.lead_in import PartBoxes, lead_in_point
+from cutter.linking import LinkPlanner
+from cutter.nc_format import CompactFormatter, FixedFormatter
+from cutter.offset import cached_offset_contours
+from cutter.simplify import simplify_contour
+from cutter.travel import VertexIndex
 import math
+from typing import Any
+from typing import Dict
+import numpy as np
 
 
 class GCode:
     def __init__(
-        self, dxf_entities, tool_radius, cutter_offset, rotation_speed, cutter_deepth
+        self,
+        geometry,
+        tool_radius,
+        cutter_offset,
+        rotation_speed,
+        cutter_deepth,
+        simplify_tolerance=None,
+        arc_fit_tolerance=None,
+        software_compensation=False,
+        step_down=None,
+        ramp_length=None,
+        link_clearance=None,
+        alignment=None,
+        feed_range=None,
+        heal_tolerance=None,
+        compact=False,
+        precision=3,
+        common_line=False,
+        travel=None,
+        start_position=None,
     ) -> None:
-        self.dxf_entities = dxf_entities
+        # geometry 是只读的 Geometry, 平移后的结果放在 work_geometry 中
+        self.geometry = geometry
+        self.work_geometry = geometry
         self.tool_radius = tool_radius
         self.cutter_offset = cutter_offset
         self.rotation_speed = rotation_speed
         self.cutter_deepth = cutter_deepth
+        # 路径简化的弦高误差(mm), None 表示不简化
+        self.simplify_tolerance = simplify_tolerance
+        self.simplified_blocks = 0
+        # 圆弧拟合的误差(mm), None 表示不拟合
+        self.arc_fit_tolerance = arc_fit_tolerance
+        self.fitted_blocks = 0
+        # 为真时由本程序计算刀具中心轨迹, 不再使用控制器的 G42 半径补偿
+        self.software_compensation = software_compensation
+        # 每层最大切深(mm), None 表示一次切到 cutter_deepth
+        self.step_down = step_down
+        # 每层沿轮廓斜线下刀的长度(mm), None 表示整圈螺旋下刀
+        self.ramp_length = ramp_length
+        # 空行程的低平面在材料表面以上的高度(mm), None 表示每次都抬到安全高度
+        self.link_clearance = link_clearance
+        # 对刀位置 {"x", "y", "z"}, 构造时复制一份, 生成过程中不再读取全局的 ALIGNMENT,
+        # 多个生成器可以在不同线程或进程中同时运行; 各轴是否有值由 check_alignment 检查
+        self.alignment: Dict[str, Any] = dict(
+            ALIGNMENT if alignment is None else alignment
+        )
+        # (最小, 最大) 进给速度(mm/min), 按拐角和圆弧半径逐段规划; None 表示全程 F400
+        self.feed_range = feed_range
+        self.current_feed = None
+        # 端点合并容差(mm), 相距小于它的端点合并成一个顶点; None 表示不修补缺口
+        self.heal_tolerance = heal_tolerance
+        self.healed_gaps = []
+        # 为真时省略重复的模态 G 代码和没有变化的坐标; precision 是坐标的小数位数
+        self.compact = compact
+        self.precision = precision
+        self.formatter = (CompactFormatter if compact else FixedFormatter)(precision)
+        # 为真时相邻零件重合的刀具轨迹只切一次, 需要软件刀具补偿
+        self.common_line = common_line
+        self.shared_length = 0.0
+        # 共边切割时每条路径的下刀点(闭合轮廓为 None)和所属的原轮廓
+        self.approaches = None
+        self.regions = None
+        # 机床各轴的行程 {"x": (最小, 最大), ...}, 生成前检查刀具路径不超出;
+        # 默认使用 consts.MACHINE_TRAVEL, 没有配置(None)的轴不检查
+        self.travel = {
+            axis: tuple(limits)
+            for axis, limits in (MACHINE_TRAVEL if travel is None else travel).items()
+            if limits is not None
+        }
+        self.contours = []
+        self.lead_ins = []
+        # 主轴当前的 (x, y) 机床坐标, 从这里出发选择切割顺序和各轮廓的下刀点;
+        # None 表示从程序原点出发, 各轮廓从离原点最近的端点开始
+        self.start_position = start_position
         self.instructions = []
-        self.bbox = bbox.extents(self.dxf_entities)
+        # 由 build_endpoint_index 按平移后的几何重新建立
+        self.endpoint_index = EndpointIndex(0.001)
 
     def generate(self) -> str:
-        self.check_tool_params()
-        self.check_entities()
-        self.check_alignment()
+        return "\n".join(self.iter_lines())
 
-        self.translate_entities()
+    def iter_lines(self):
+        # 按轮廓逐段产出指令, 缓冲区里最多只保留一个轮廓的指令
+        self.prepare_geometry()
 
         self.prepare_instructions()
-        self.draw_entities()
+        yield from self.flush_instructions()
+
+        yield from self.iter_contour_lines()
 
         # self.fast_move_z(15)
         self.end_instructions()
+        yield from self.flush_instructions()
 
-        return "\n".join(self.instructions)
+    def prepare_geometry(self):
+        self.current_feed = None
+        self.formatter.reset()
+        self.check_tool_params()
+        self.check_entities()
+        self.check_alignment()
+
+        self.translate_entities()
+        if self.heal_tolerance is not None:
+            self.heal_gaps(self.heal_tolerance)
+        self.build_endpoint_index()
+
+        # 先规划出全部轮廓并检查行程, 超出时在输出任何指令之前报错
+        self.contours = self.plan_contours()
+        self.lead_ins = self.prepare_lead_ins()
+        self.check_travel(self.contours)
+
+    def iter_contour_lines(self):
+        # 只有各轮廓的切割指令, 不含程序头尾; 需要先调用 prepare_geometry
+        links = None
+        clearance = self.safe_height()
+        if self.link_clearance is not None:
+            links = LinkPlanner()
+            clearance = min(self.alignment["z"] + self.link_clearance, clearance)
+        position = None
+
+        for n, (contour, lead_in) in enumerate(zip(self.contours, self.lead_ins)):
+            if links is None:
+                if n > 0:
+                    self.fast_move_z(self.safe_height())
+                self.fast_move_xy(*lead_in)
+            else:
+                self.link_to(links, position, lead_in, clearance)
+
+            position = self.draw_contour(contour)
+            if links is not None:
+                region = contour if self.regions is None else self.regions[n]
+                links.add(contour_polygon(region))
+            yield from self.flush_instructions()
+
+    def write_to(self, file, chunk_size=1000):
+        separator = ""
+        chunk = []
+
+        for line in self.iter_lines():
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                file.write(separator + "\n".join(chunk))
+                separator = "\n"
+                chunk = []
+
+        if chunk:
+            file.write(separator + "\n".join(chunk))
+
+    def estimate_cycle_time(self, limits=None):
+        # 生成的各行拼成文本后一次解析, 不写入文件
+        return estimate_cycle_time(self.iter_lines(), limits)
+
+    def flush_instructions(self):
+        instructions = self.instructions
+        self.instructions = []
+        return instructions
 
     def prepare_instructions(self):
         self.instructions.append("G90 (Absolute programming)")
         self.instructions.append("G17 (XY plane)")
         # self.instructions.append("G40 (Cancel radius comp)")
-        self.instructions.append(
-            "G00 Z{:.3f} (z safe margin)".format(self.safe_height())
-        )
+        self.fast_move_z(self.safe_height(), "z safe margin")
         # self.instructions.append("T1 M6")
-        self.instructions.append(
-            "#set ToolParam(1; 4; {:.3f})#".format(
-                self.tool_radius - self.cutter_offset
+        if not self.software_compensation:
+            self.instructions.append(
+                "#set ToolParam(1; 4; {:.3f})#".format(self.compensation_radius())
             )
-        )
-        self.instructions.append("D1")
+            self.instructions.append("D1")
         self.instructions.append("M08")  # start dust catcher
         self.instructions.append(f"S{self.rotation_speed} M03")
-        self.set_right_compensation()
+        if not self.software_compensation:
+            self.set_right_compensation()
 
     def end_instructions(self):
-        self.instructions.append(
-            "G01 Z{:.3f} (z safe margin)".format(self.safe_height())
-        )
+        self.move_z(self.safe_height(), "z safe margin")
         self.instructions.append("S0 M05")
         self.instructions.append("M09")  # stop dust catcher
         self.stop_compensation()
         self.fast_move_xy(0, 0)
         self.instructions.append("M2 (Program end)")
 
-    def draw_entities(self):
-        if len(self.dxf_entities) == 1 and self.dxf_entities[0].dxftype() == "CIRCLE":
-            self.draw_circle(self.dxf_entities[0])
-        else:
-            (start_entity, start_point, end_point) = self.get_start_entity()
-            self.move_to_prepare_point(start_point)
-            self.set_move_speed(400)
-            self.move_to_cut_deepth()
-            self.move_xy(start_point.x, start_point.y)
-            self.draw_line_and_arc(start_entity, start_point, end_point)
-            # self.draw_line_and_arc(start_entity, start_point, end_point)
-
-    def draw_circle(self, circle):
-        center = circle.dxf.center
-        radius = circle.dxf.radius
-
-        start = Vec3(center.x, center.y - radius, 0)
-        end = Vec3(center.x, center.y + radius, 0)
-
-        self.move_to_prepare_point(start)
-        self.set_move_speed(400)
-        self.move_to_cut_deepth()
-        self.move_xy(start.x, start.y)
-        self.instructions.append(
-            "G03 X{:.3f} Y{:.3f} I{:.3f}  J{:.3f}".format(end.x, end.y, 0, radius)
-        )
-        self.instructions.append(
-            "G03 X{:.3f} Y{:.3f} I{:.3f}  J{:.3f}".format(start.x, start.y, 0, -radius)
-        )
-        # repeat
-        # self.instructions.append(
-        #     "G03 X{:.3f} Y{:.3f} I{:.3f}  J{:.3f}".format(end.x, end.y, 0, radius)
-        # )
-        # self.instructions.append(
-        #     "G03 X{:.3f} Y{:.3f} I{:.3f}  J{:.3f}".format(start.x, start.y, 0, -radius)
-        # )
-
-    def draw_line_and_arc(self, start_entity, start_point, end_point):
-        entity = start_entity
-        sp = start_point
-        ep = end_point
-
-        while entity is not None:
-            if entity.dxftype() == "LINE":
-                print(f"move to {ep.x} {ep.y}")
-                self.move_xy(ep.x, ep.y)
-
-            if entity.dxftype() == "ARC":
-                center = entity.dxf.center
-
-                instruct = (
-                    "G03" if self.is_same_point(entity.start_point, sp) else "G02"
-                )
-                self.instructions.append(
-                    "{} X{:.3f} Y{:.3f} I{:.3f}  J{:.3f}".format(
-                        instruct, ep.x, ep.y, center.x - sp.x, center.y - sp.y
-                    )
+    def travel_bounds(self, contours):
+        """
+        刀具中心在各轴上的范围 {"x": (最小, 最大), ...}。
+        包括所有轮廓(圆弧取经过的象限点)、下刀点、程序结束回到的原点,
+        以及从切割深度到安全高度的 Z 范围。使用 G42 补偿时轮廓向外扩展补偿半径。
+        """
+        kinds = np.concatenate([c.kinds for c in contours])
+        starts = np.vstack([c.points[:-1] for c in contours])
+        ends = np.vstack([c.points[1:] for c in contours])
+        centers = np.vstack([c.centers for c in contours])
+        ccw = np.concatenate([c.ccw for c in contours])
+        mins, maxs = segment_bounds(kinds != LINE, starts, ends, centers, ccw)
+
+        if not self.software_compensation:
+            mins = mins - self.compensation_radius()
+            maxs = maxs + self.compensation_radius()
+
+        points = np.vstack([mins, maxs, np.array(self.lead_ins), [(0.0, 0.0)]])
+        low = points.min(axis=0).tolist()
+        high = points.max(axis=0).tolist()
+
+        z = float(self.alignment["z"])
+        return {
+            "x": (low[0], high[0]),
+            "y": (low[1], high[1]),
+            "z": (z - self.cutter_deepth, self.safe_height()),
+        }
+
+    def check_travel(self, contours):
+        bounds = self.travel_bounds(contours)
+        errors = []
+        for axis, (low, high) in self.travel.items():
+            lo, hi = bounds[axis]
+            if lo < low or hi > high:
+                errors.append(
+                    f"{axis.upper()} 轴需要 {lo:.3f} ~ {hi:.3f}, 行程 {low:.3f} ~ {high:.3f}"
                 )
+        if errors:
+            raise Exception("刀具路径超出机床行程: " + "; ".join(errors) + "!")
+
+    def plan_contours(self):
+        if self.software_compensation:
+            # 同一几何、同一组拟合参数和同一补偿半径的刀具轨迹直接复用
+            key = (
+                self.work_geometry.fingerprint(),
+                self.arc_fit_tolerance,
+                self.simplify_tolerance,
+                None if self.start_position is None else tuple(self.start_position),
+            )
+            contours = cached_offset_contours(
+                key, self.build_contours, self.compensation_radius()
+            )
+        else:
+            contours = self.build_contours()
 
-            (entity, sp, ep) = self.get_next_entity(entity.dxf.handle, ep)
-            if entity is None or entity.dxf.handle == start_entity.dxf.handle:
-                break
+        if self.common_line:
+            contours = self.split_common_lines(contours)
 
-    def move_xy(self, x, y):
-        self.instructions.append("G01 X{:.3f} Y{:.3f}".format(x, y))
+        return contours
 
-    def move_z(self, z):
-        self.instructions.append("G01 Z{:.3f}".format(z))
+    def split_common_lines(self, contours):
+        # 与先切的轮廓重合的部分去掉, 后切的轮廓拆成不闭合的路径
+        shared = find_shared_edges(contours)
+        paths, sources, self.approaches, self.shared_length = split_shared_edges(
+            contours, shared
+        )
+        # 切完不闭合的路径后, 已切割区域按它所属的整个零件记录
+        self.regions = [contours[i] for i in sources]
+        print(f"common line removed {self.shared_length:.3f} mm")
+        return paths
+
+    def build_contours(self):
+        contours = self.get_contours()
+        if len(contours) == 0:
+            raise Exception("dxf实体不封闭!")
+
+        if self.arc_fit_tolerance is not None:
+            contours = self.fit_arc_contours(contours)
+
+        if self.simplify_tolerance is not None:
+            contours = self.simplify_contours(contours, self.simplify_tolerance)
+
+        return self.order_contours(contours)
+
+    def order_contours(self, contours):
+        # 孔先于外轮廓切割; 外轮廓逆时针、孔顺时针走刀, G42 的补偿都落在废料一侧
+        polygons = [contour_polygon(c) for c in contours]
+        parents = containment_parents(polygons)
+        depths = containment_depths(parents)
+
+        oriented = []
+        for c, polygon, depth in zip(contours, polygons, depths):
+            if (signed_area(polygon) > 0) != (depth % 2 == 0):
+                c = c.reverse()
+            oriented.append(c)
+
+        if self.start_position is not None:
+            return self.order_from_position(oriented, parents, self.start_position)
+
+        start_points = [tuple(c.start_point.tolist()) for c in oriented]
+        return [oriented[i] for i in cut_order(start_points, parents)]
+
+    def order_from_position(self, contours, parents, start_position):
+        """
+        从主轴当前位置 start_position 出发安排切割顺序: 先用各轮廓离当前位置最近的顶点排序,
+        再沿切割顺序把每个轮廓的起点改为离上一个下刀点最近的顶点,
+        第一段空行程就是到最近可切轮廓的距离。
+        """
+        position = tuple(float(v) for v in start_position[:2])
+        index = VertexIndex([c.points[:-1] for c in contours])
+        nearest = index.nearest_all(position)
+        start_points = [tuple(c.points[k].tolist()) for c, k in zip(contours, nearest)]
+
+        ordered = []
+        for i in cut_order(start_points, parents, position):
+            contour = contours[i].rotate(index.nearest(i, position))
+            ordered.append(contour)
+            position = tuple(contour.start_point.tolist())
+
+        return ordered
+
+    def fit_arc_contours(self, contours):
+        fitted = []
+        self.fitted_blocks = 0
+
+        for c in contours:
+            c, removed = fit_arcs(c, self.arc_fit_tolerance)
+            fitted.append(c)
+            self.fitted_blocks += removed
+
+        print(f"arc fitting removed {self.fitted_blocks} blocks")
+        return fitted
+
+    def simplify_contours(self, contours, tolerance):
+        simplified = []
+        self.simplified_blocks = 0
+
+        for c in contours:
+            c, removed = simplify_contour(c, tolerance)
+            simplified.append(c)
+            self.simplified_blocks += removed
+
+        print(f"simplify removed {self.simplified_blocks} blocks")
+        return simplified
+
+    def link_to(self, links, position, lead_in, clearance):
+        """
+        从上一个轮廓的终点 position 移动到下一个轮廓的下刀点 lead_in, clearance 是低平面的高度。
+        行程不经过已切割区域时只抬到低平面; 否则抬到安全高度水平移动,
+        到达下刀点上方后再下降到低平面。G00 不保证各轴按直线插补,
+        水平移动和下降写在同一段里时 Z 可能在经过已切割区域时就降到低平面。
+        """
+        x, y = lead_in
+
+        if position is None:
+            # 第一个轮廓从安全高度出发。generate_parts 中各零件的第一个轮廓
+            # 之前已经切过其他零件, 本进程不知道它们的位置, 同样先水平移动再下降
+            self.fast_move_xy(x, y)
+            self.fast_move_z(clearance)
+            return
+
+        if not links.crosses(position, (x, y)):
+            self.fast_move_z(clearance)
+            self.fast_move_xy(x, y)
+            return
+
+        self.fast_move_z(self.safe_height())
+        self.fast_move_xy(x, y)
+        self.fast_move_z(clearance)
+
+    def draw_contour(self, contour):
+        # 返回切完后刀具所在的点
+        x, y = contour.start_point.tolist()
+        feeds = self.plan_feeds(contour)
+
+        if self.feed_range is None:
+            self.set_move_speed(400)
+        else:
+            # 切入段用最小进给
+            self.change_feed(self.feed_range[0])
+
+        if self.step_down is None:
+            self.move_to_cut_deepth()
+            self.move_xy(x, y)
+            self.draw_line_and_arc(contour, feeds=feeds)
+            if not contour.is_closed():
+                return tuple(contour.points[-1].tolist())
+            return (x, y)
+
+        return self.draw_step_down_passes(contour, feeds)
+
+    def plan_feeds(self, contour):
+        if self.feed_range is None:
+            return None
+
+        min_feed, max_feed = self.feed_range
+        return plan_feeds(contour, min_feed, max_feed, closed=contour.is_closed())
+
+    def draw_step_down_passes(self, contour, feeds=None):
+        """
+        分层切割: 在材料表面切入起点, 每层沿轮廓开头的 ramp_length 斜线(圆弧上为螺旋线)
+        下到本层深度, 再切完整圈。层与层之间不抬刀, 最后在最终深度补切一遍斜坡段。
+        """
+        x, y = contour.start_point.tolist()
+        z = float(self.alignment["z"])
+        self.fast_move_z(z)
+        self.move_xy(x, y)
+
+        if not contour.is_closed():
+            return self.draw_open_passes(contour)
+
+        length = float(contour.lengths().sum())
+        if self.ramp_length is None:
+            ramp, rest = contour, None
+        else:
+            ramp, rest = contour.split(min(self.ramp_length, length))
+
+        # 分割点所在的段同时属于前后两段, 沿用原来这一段的进给
+        ramp_feeds = rest_feeds = None
+        if feeds is not None:
+            ramp_feeds = feeds[: len(ramp)]
+            if rest is not None:
+                rest_feeds = feeds[len(contour) - len(rest) :]
+
+        for depth in self.pass_depths():
+            self.draw_line_and_arc(ramp, (z, depth), ramp_feeds)
+            if rest is not None:
+                self.draw_line_and_arc(rest, feeds=rest_feeds)
+            z = depth
+
+        self.draw_line_and_arc(ramp, feeds=ramp_feeds)
+        return tuple(ramp.points[-1].tolist())
+
+    def draw_open_passes(self, path):
+        # 不闭合的路径无法绕圈下刀, 每层沿整条路径斜线下刀并往返走刀, 最后在最终深度再走一遍
+        z = float(self.alignment["z"])
+        for depth in self.pass_depths():
+            self.draw_line_and_arc(path, (z, depth), self.plan_feeds(path))
+            path = path.reverse()
+            z = depth
+
+        self.draw_line_and_arc(path, feeds=self.plan_feeds(path))
+        return tuple(path.points[-1].tolist())
+
+    def pass_depths(self):
+        # 各层的 Z 坐标, 层数取满足每层不超过 step_down 的最少层数, 各层切深相等
+        count = max(int(math.ceil(self.cutter_deepth / self.step_down - 1e-9)), 1)
+        return [
+            self.alignment["z"] - self.cutter_deepth * k / count
+            for k in range(1, count + 1)
+        ]
+
+    def draw_line_and_arc(self, contour, ramp=None, feeds=None):
+        # ramp=(z0, z1) 时 Z 按走过的长度从 z0 线性变化到 z1; feeds 是每段的进给速度
+        n = len(contour)
+        if n == 0:
+            return
+
+        is_arc = contour.kinds == ARC
+        motions = np.where(is_arc, np.where(contour.ccw, 3, 2), 1)
+        offsets = np.where(
+            is_arc[:, None], contour.centers - contour.points[:-1], np.nan
+        )
+        zs = np.full(n, np.nan)
+        if ramp is not None:
+            z0, z1 = ramp
+            distances = np.cumsum(contour.lengths())
+            zs = z0 + (z1 - z0) * distances / distances[-1]
+
+        # 整个轮廓的各段一次格式化, 只在进给变化处插入 F
+        blocks = self.formatter.blocks(motions, contour.points[1:], zs, offsets)
+        if feeds is None:
+            self.instructions.extend(b for b in blocks if b is not None)
+            return
+
+        for feed, block in zip(feeds, blocks):
+            self.change_feed(feed)
+            if block is not None:
+                self.instructions.append(block)
+
+    def add_block(self, motion, x=None, y=None, z=None, i=None, j=None, comment=None):
+        block = self.formatter.block(motion, x, y, z, i, j, comment)
+        if block is not None:
+            self.instructions.append(block)
+
+    def move_xy(self, x, y, z=None):
+        self.add_block(1, x, y, z)
+
+    def move_arc(self, x, y, i, j, ccw, z=None):
+        # 带 Z 的圆弧为螺旋插补
+        self.add_block(3 if ccw else 2, x, y, z, i, j)
+
+    def move_z(self, z, comment=None):
+        self.add_block(1, z=z, comment=comment)
 
     def fast_move_xy(self, x, y):
-        self.instructions.append("G00 X{:.3f} Y{:.3f}".format(x, y))
+        self.add_block(0, x, y)
 
-    def fast_move_z(self, z):
-        self.instructions.append("G00 Z{:.3f}".format(z))
+    def fast_move_z(self, z, comment=None):
+        self.add_block(0, z=z, comment=comment)
 
     def safe_height(self):
-        return float(ALIGNMENT["z"]) + 10
-
-    def move_to_prepare_point(self, start_point):
-        self.fast_move_xy(start_point.x - 10, start_point.y)
+        return float(self.alignment["z"]) + 10
+
+    def prepare_lead_ins(self):
+        """
+        各路径的下刀点。闭合轮廓由 prepare_point 在废料一侧找, 并避开附近的其他轮廓;
+        共边切割拆出的不闭合路径从已切开的切缝上下刀。
+        """
+        # 共边切割时一个零件拆成多条路径, 按所属的原轮廓去重
+        regions = self.contours if self.regions is None else self.regions
+        parts = {}
+        for region in regions:
+            parts.setdefault(id(region), (len(parts), contour_polygon(region)))
+        boxes = PartBoxes([polygon for _, polygon in parts.values()])
+
+        lead_ins = []
+        for contour, region, approach in zip(
+            self.contours, regions, self.approaches or [None] * len(regions)
+        ):
+            if contour.is_closed():
+                part, polygon = parts[id(region)]
+                # 没有拆开的轮廓就是所属的零件, 展开的多边形直接复用
+                if region is not contour:
+                    polygon = None
+                lead_ins.append(self.prepare_point(contour, boxes, part, polygon))
+            else:
+                lead_ins.append(approach)
+        return lead_ins
+
+    def prepare_point(self, contour, parts=None, part=None, polygon=None):
+        """
+        下刀点在起点的废料一侧: 外轮廓在轮廓外, 孔在孔内, 从这里直线切入起点。
+        使用 G42 时刀具中心可能在下刀点, 与轮廓之间至少留出补偿半径;
+        软件补偿的轮廓已经是刀具中心轨迹, 只需在废料一侧。
+        parts 中第 part 个以外的附近轮廓按同样的距离避开, 下刀点不会落在相邻零件上。
+        """
+        clearance = 0.0 if self.software_compensation else self.compensation_radius()
+        # 靠近行程边缘时缩短切入线, 下刀点不超出 X/Y 行程
+        limits = [self.travel.get(axis, (-np.inf, np.inf)) for axis in "xy"]
+        bounds = ([low for low, _ in limits], [high for _, high in limits])
+        point = lead_in_point(
+            contour, clearance, bounds=bounds, parts=parts, part=part, polygon=polygon
+        )
+        if point is None:
+            raise Exception("孔太小或轮廓太窄, 无法安排下刀点!")
+        return point
 
     def move_to_cut_deepth(self):
-        self.instructions.append(
-            "G00 Z{:.3f} (cut deepth)".format(ALIGNMENT["z"] - self.cutter_deepth)
-        )
+        self.fast_move_z(self.alignment["z"] - self.cutter_deepth, "cut deepth")
 
     def set_move_speed(self, speed):
         self.instructions.append(f"F{speed}")
 
+    def change_feed(self, speed):
+        # F 是模态的, 与当前进给相同时不再输出
+        if speed != self.current_feed:
+            self.set_move_speed(speed)
+            self.current_feed = speed
+
     def set_right_compensation(self):
         self.instructions.append("G42")
 
+    def compensation_radius(self):
+        return self.tool_radius - self.cutter_offset
+
     def stop_compensation(self):
         self.instructions.append("G40")
 
@@ -159,68 +584,52 @@ class GCode:
         # ALIGNMENT["y"] = 10
         # ALIGNMENT["z"] = 10
 
-        if ALIGNMENT["x"] is None or ALIGNMENT["y"] is None or ALIGNMENT["z"] is None:
+        if any(self.alignment.get(axis) is None for axis in "xyz"):
             raise Exception("未对刀!")
 
     def check_entities(self):
-        if len(self.dxf_entities) == 0:
+        if len(self.geometry) == 0:
             raise Exception("没有可用的dxf实体!")
 
-        if len(self.dxf_entities) == 1 and self.dxf_entities[0].dxf.dxftype != "CIRCLE":
+        if len(self.geometry) == 1 and self.geometry.kinds[0] != CIRCLE:
             raise Exception("dxf实体不封闭!")
 
     def check_tool_params(self):
         if self.rotation_speed == 0:
             raise Exception("刀具转速未配置!")
 
-        if (self.tool_radius - self.cutter_offset) == 0:
+        if self.compensation_radius() == 0:
             raise Exception("刀具半径配置错误!")
 
         if self.cutter_deepth == 0:
             raise Exception("切割深度未配置!")
 
-    def get_entity_bbox(self, e):
-        if e.dxf.dxftype == "CIRCLE":
-            return self.get_circle_bounding_box(e)
+        if self.step_down is not None and self.step_down <= 0:
+            raise Exception("每层切深配置错误!")
 
-        if e.dxf.dxftype == "LINE":
-            return self.get_line_bounding_box(e)
+        if self.ramp_length is not None and self.ramp_length <= 0:
+            raise Exception("下刀斜坡长度配置错误!")
 
-        if e.dxf.dxftype == "ARC":
-            return self.get_arc_bounding_box(e)
+        if self.link_clearance is not None and self.link_clearance <= 0:
+            raise Exception("空行程高度配置错误!")
 
-    def get_circle_bounding_box(self, circle):
-        center = Vec3(circle.dxf.center)
-        radius = circle.dxf.radius
+        if self.common_line and not self.software_compensation:
+            raise Exception("共边切割需要使用软件刀具补偿!")
 
-        min_point = center - Vec3(radius, radius, 0)
-        max_point = center + Vec3(radius, radius, 0)
+        if self.heal_tolerance is not None and self.heal_tolerance <= 0:
+            raise Exception("端点合并容差配置错误!")
 
-        return BoundingBox([min_point, max_point])
-
-    def get_line_bounding_box(self, line):
-        start_point = line.dxf.start
-        end_point = line.dxf.end
-
-        min_x = min(start_point[0], end_point[0])
-        min_y = min(start_point[1], end_point[1])
-        max_x = max(start_point[0], end_point[0])
-        max_y = max(start_point[1], end_point[1])
-
-        min_point = Vec3(min_x, min_y, 0)
-        max_point = Vec3(max_x, max_y, 0)
-
-        return BoundingBox([min_point, max_point])
-
-    def get_arc_bounding_box(self, arc):
-        pass
+        if self.feed_range is not None and not (
+            0 < self.feed_range[0] <= self.feed_range[1]
+        ):
+            raise Exception("进给速度范围配置错误!")
 
     def bbox_min_point(self):
-        return min(self.bbox)
+        return Vec3(self.geometry.extmin[0], self.geometry.extmin[1], 0)
 
     def calc_offset(self):
-        alignment_x = ALIGNMENT["x"]
-        alignment_y = ALIGNMENT["y"]
+        alignment_x = self.alignment["x"]
+        alignment_y = self.alignment["y"]
 
         min_point = self.bbox_min_point()
         print(f"min_point={min_point}")
@@ -230,135 +639,104 @@ class GCode:
         return Vec3(offset_x, offset_y, 0)
 
     def translate_entities(self):
+        # 只平移几何数据, 不修改 dxf 文档, 可以反复生成
         offset = self.calc_offset()
         print(f"offet={offset}")
 
-        for e in self.dxf_entities:
-            e.translate(offset.x, offset.y, 0)
-
-    def get_start_point_entity(self):
-        entities_map = {}
-        dist_lines = []
-
-        for e in self.dxf_entities:
-            entities_map[e.dxf.handle] = e
-            if e.dxftype() == "LINE":
-                p, m = self.min_point(e.dxf.start, e.dxf.end)
-                dist_lines.append((e, m, p))
-            if e.dxftype() == "ARC":
-                p, m = self.min_point(e.start_point, e.end_point)
-                dist_lines.append((e, m, p))
-
-        dist_lines.sort(key=lambda x: x[1])
-
-        return (dist_lines[0][0], dist_lines[1][0])
-
-    def min_point(self, p1, p2):
-        m1 = p1.magnitude
-        m2 = p2.magnitude
-
-        if m1 < m2:
-            return (p1, m1)
-        else:
-            return (p2, m2)
-
-    def get_entities_by_point(self, point):
-        entities = []
-        for e in self.dxf_entities:
-            if e.dxftype() == "LINE":
-                print(f"entity[{e.dxf.handle}]")
-                if self.is_same_point(point, e.dxf.start) or self.is_same_point(
-                    point, e.dxf.end
-                ):
-                    entities.append(e)
-            if e.dxftype() == "ARC":
-                if self.is_same_point(point, e.start_point) or self.is_same_point(
-                    point, e.end_point
-                ):
-                    entities.append(e)
-
-        return entities
-
-    def get_start_point(self):
-        points = []
-
-        for e in self.dxf_entities:
-            if e.dxftype() == "LINE":
-                points.append(e.dxf.start)
-                points.append(e.dxf.end)
-            if e.dxftype() == "ARC":
-                points.append(e.start_point)
-                points.append(e.end_point)
-
-        points.sort(key=lambda x: x.magnitude)
-
-        return points[0]
-
-    def get_start_entity(self):
-        point = self.get_start_point()
-        start_entities = self.get_entities_by_point(point)
-
-        if len(start_entities) != 2:
+        self.work_geometry = self.geometry.translate(offset.x, offset.y)
+
+    def heal_gaps(self, tolerance):
+        # 修补 dxf 中没有对齐的端点, 使轮廓可以一次链接成封闭轮廓
+        self.work_geometry, self.healed_gaps = heal_gaps(self.work_geometry, tolerance)
+        for gap in self.healed_gaps:
+            print(f"healed gap {gap}")
+        print(f"healed {len(self.healed_gaps)} gaps")
+
+    def build_endpoint_index(self):
+        # 链接轮廓时按网格查找端点, 避免每一步都遍历全部线段
+        geometry = self.work_geometry
+        self.endpoint_index = EndpointIndex(0.001)
+
+        starts = geometry.starts.tolist()
+        ends = geometry.ends.tolist()
+        for i in np.flatnonzero(geometry.kinds != CIRCLE).tolist():
+            self.endpoint_index.add(starts[i], (i, True))
+            self.endpoint_index.add(ends[i], (i, False))
+
+    def get_contours(self):
+        # 把所有线段拆分成封闭轮廓, 整圆单独成为一个轮廓
+        geometry = self.work_geometry
+        kinds = geometry.kinds.tolist()
+        starts = geometry.starts.tolist()
+        ends = geometry.ends.tolist()
+        contours = []
+        visited = set()
+
+        for i, kind in enumerate(kinds):
+            if kind == CIRCLE:
+                center = geometry.centers[i].tolist()
+                contours.append(Contour.circle(center, geometry.radii[i]))
+                continue
+
+            if i in visited:
+                continue
+
+            visited.add(i)
+            indices = [i]
+            forwards = [True]
+            ep = ends[i]
+            is_closed = self.is_same_point(ep, starts[i])
+
+            while not is_closed:
+                found = self.get_next_entity(indices[-1], ep, visited)
+                if found is None:
+                    break
+
+                index, forward = found
+                visited.add(index)
+                indices.append(index)
+                forwards.append(forward)
+                ep = ends[index] if forward else starts[index]
+                is_closed = self.is_same_point(ep, starts[i])
+
+            if is_closed:
+                contour = Contour.from_segments(geometry, indices, forwards)
+                contours.append(self.get_start_entity(contour))
+            else:
+                print(f"skip open contour from entity[{geometry.handles[i]}]")
+
+        return contours
+
+    def get_start_entity(self, contour):
+        # 轮廓从离原点最近的端点开始切割
+        if len(contour) == 0:
             raise Exception("找不到起始点！")
 
-        e1 = start_entities[0]
-        e2 = start_entities[1]
+        k = int(np.argmin(np.hypot(contour.points[:-1, 0], contour.points[:-1, 1])))
+        contour = contour.rotate(k)
 
-        p1 = (
-            self.entity_end_point(e1)
-            if self.is_same_point(self.entity_start_point(e1), point)
-            else self.entity_start_point(e1)
-        )
-        p2 = (
-            self.entity_end_point(e2)
-            if self.is_same_point(self.entity_start_point(e2), point)
-            else self.entity_start_point(e2)
-        )
+        x1, y1 = contour.points[1].tolist()
+        x2, y2 = contour.points[-2].tolist()
 
-        if math.atan2(p1.y, p1.x) < math.atan2(p2.y, p2.x):
-            return (e1, point, p1)
+        if math.atan2(y1, x1) < math.atan2(y2, x2):
+            return contour
         else:
-            return (e2, point, p2)
-
-    def entity_start_point(self, entity):
-        if entity.dxftype() == "LINE":
-            return entity.dxf.start
-
-        if entity.dxftype() == "ARC":
-            return entity.start_point
-
-    def entity_end_point(self, entity):
-        if entity.dxftype() == "LINE":
-            return entity.dxf.end
-
-        if entity.dxftype() == "ARC":
-            return entity.end_point
-
-    def get_next_entity(self, entity_id, point):
-        start_point = None
-        end_point = None
-
-        for e in self.dxf_entities:
-            if e.dxf.handle != entity_id:
-                if e.dxftype() == "LINE":
-                    start_point = e.dxf.start
-                    end_point = e.dxf.end
-
-                if e.dxftype() == "ARC":
-                    start_point = e.start_point
-                    end_point = e.end_point
+            return contour.reverse()
 
-                if self.is_same_point(point, start_point):
-                    return (e, start_point, end_point)
+    def get_next_entity(self, index, point, visited=None):
+        # 返回 (序号, 是否从起点接上), 找不到时返回 None
+        for i, is_start in self.endpoint_index.query(point):
+            if i != index:
+                if visited is not None and i in visited:
+                    continue
 
-                if self.is_same_point(point, end_point):
-                    return (e, end_point, start_point)
+                return (i, is_start)
 
-        return (None, None, None)
+        return None
 
     def is_same_point(self, p1, p2):
         epsilon = 0.001
-        return p1.distance(p2) < epsilon
+        return math.hypot(p1[0] - p2[0], p1[1] - p2[1]) < epsilon
 
     def is_end(self, start_point, point):
         return self.is_same_point(start_point, point)
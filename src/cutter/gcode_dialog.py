@@ -10,6 +10,7 @@ from qtpy.QtWidgets import (
     QVBoxLayout,
 )
 
+from cutter.cycle_time import estimate_cycle_time
 from cutter.gcode import GCode
 
 
@@ -23,8 +24,13 @@ class GCodeDialog(QDialog):
 
         self.gcode_edit = QTextEdit(self)
         self.gcode_edit.setPlainText(gcode_text)
+        self.cycle_time_label = QLabel(self)
+        if gcode_text:
+            cycle_time = estimate_cycle_time(gcode_text)
+            self.cycle_time_label.setText(f"预计加工时间: {cycle_time}")
         # 将组件添加到布局中
         layout = QVBoxLayout()
         layout.addWidget(self.gcode_edit)
+        layout.addWidget(self.cycle_time_label)
 
         self.setLayout(layout)
@@ -0,0 +1,541 @@
+import hashlib
+
+import numpy as np
+
+from cutter.biarc import CURVE_TOLERANCE, curve_vertices
+
+# 几何类型编码
+LINE = 0
+ARC = 1
+CIRCLE = 2
+
+
+class Geometry:
+    """
+    从 modelspace 查询结果中一次性提取的只读几何数据。
+
+    每一行是一段几何: 类型编码、起点、终点、圆心、半径和起止角(度, 逆时针)。
+    平移等操作返回新的 Geometry, 不会修改 ezdxf 文档中的实体。
+    """
+
+    def __init__(
+        self,
+        kinds,
+        starts,
+        ends,
+        centers,
+        radii,
+        start_angles,
+        end_angles,
+        handles,
+        extmin=None,
+        extmax=None,
+    ) -> None:
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        self.centers = centers
+        self.radii = radii
+        self.start_angles = start_angles
+        self.end_angles = end_angles
+        self.handles = handles
+        self.extmin = extmin
+        self.extmax = extmax
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @staticmethod
+    def from_entities(entities, curve_tolerance=CURVE_TOLERANCE):
+        kinds = []
+        centers = []
+        radii = []
+        start_angles = []
+        end_angles = []
+        line_points = []
+        from_angles = []
+        handles = []
+
+        for e in entities:
+            dxftype = e.dxftype()
+            if dxftype == "LINE":
+                kinds.append(LINE)
+                line_points.append(
+                    (e.dxf.start.x, e.dxf.start.y, e.dxf.end.x, e.dxf.end.y)
+                )
+                centers.append((0.0, 0.0))
+                radii.append(0.0)
+                start_angles.append(0.0)
+                end_angles.append(0.0)
+                from_angles.append(False)
+            elif dxftype == "ARC" or dxftype == "CIRCLE":
+                is_arc = dxftype == "ARC"
+                kinds.append(ARC if is_arc else CIRCLE)
+                line_points.append((0.0, 0.0, 0.0, 0.0))
+                centers.append((e.dxf.center.x, e.dxf.center.y))
+                radii.append(e.dxf.radius)
+                start_angles.append(e.dxf.start_angle if is_arc else 270.0)
+                end_angles.append(e.dxf.end_angle if is_arc else 270.0)
+                from_angles.append(True)
+            elif dxftype in ("LWPOLYLINE", "ELLIPSE", "SPLINE"):
+                # 多段线直接展开成直线段和圆弧段, 端点使用顶点坐标,
+                # 椭圆和样条先拟合成双圆弧
+                if dxftype == "LWPOLYLINE":
+                    segments = polyline_segments(e)
+                else:
+                    segments = curve_segments(e, curve_tolerance)
+                n = len(segments[0])
+                kinds.extend(segments[0].tolist())
+                line_points.extend(np.hstack(segments[1:3]).tolist())
+                centers.extend(segments[3].tolist())
+                radii.extend(segments[4].tolist())
+                start_angles.extend(segments[5].tolist())
+                end_angles.extend(segments[6].tolist())
+                from_angles.extend([False] * n)
+                handles.extend([e.dxf.handle] * n)
+                continue
+            else:
+                continue
+            handles.append(e.dxf.handle)
+
+        kinds = np.array(kinds, dtype=np.int8)
+        line_points = np.array(line_points, dtype=np.float64).reshape(-1, 4)
+        centers = np.array(centers, dtype=np.float64).reshape(-1, 2)
+        radii = np.array(radii, dtype=np.float64)
+        start_angles = np.array(start_angles, dtype=np.float64)
+        end_angles = np.array(end_angles, dtype=np.float64)
+        from_angles = np.array(from_angles, dtype=bool)
+
+        # 圆弧和整圆的端点由圆心、半径和角度计算, 整圆的起止点都在正下方
+        starts = line_points[:, 0:2].copy()
+        ends = line_points[:, 2:4].copy()
+        starts[from_angles] = arc_points(centers, radii, start_angles)[from_angles]
+        ends[from_angles] = arc_points(centers, radii, end_angles)[from_angles]
+
+        extmin, extmax = segment_extents(
+            kinds, starts, ends, centers, radii, start_angles, end_angles
+        )
+
+        return Geometry(
+            kinds,
+            starts,
+            ends,
+            centers,
+            radii,
+            start_angles,
+            end_angles,
+            handles,
+            extmin,
+            extmax,
+        )
+
+    def fingerprint(self):
+        # 几何数据的摘要, 用于缓存由几何计算出的结果
+        digest = hashlib.sha1()
+        for array in (
+            self.kinds,
+            self.starts,
+            self.ends,
+            self.centers,
+            self.radii,
+            self.start_angles,
+            self.end_angles,
+        ):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def concatenate(geometries):
+        # 把多个 Geometry 合并成一个, 用于把多个零件排在同一个程序里
+        geometries = [g for g in geometries if len(g) > 0]
+        if not geometries:
+            return Geometry.from_entities([])
+
+        extmin = np.min([g.extmin for g in geometries], axis=0)
+        extmax = np.max([g.extmax for g in geometries], axis=0)
+        handles = []
+        for g in geometries:
+            handles.extend(g.handles)
+
+        return Geometry(
+            np.concatenate([g.kinds for g in geometries]),
+            np.vstack([g.starts for g in geometries]),
+            np.vstack([g.ends for g in geometries]),
+            np.vstack([g.centers for g in geometries]),
+            np.concatenate([g.radii for g in geometries]),
+            np.concatenate([g.start_angles for g in geometries]),
+            np.concatenate([g.end_angles for g in geometries]),
+            handles,
+            extmin,
+            extmax,
+        )
+
+    def rotate(self, angle):
+        # 绕原点逆时针旋转 angle 度, 整圆的起止点仍然放在正下方
+        radians = np.radians(angle)
+        cos, sin = np.cos(radians), np.sin(radians)
+        matrix = np.array([[cos, sin], [-sin, cos]])
+
+        centers = self.centers @ matrix
+        is_arc = self.kinds == ARC
+        # 起止角不取模, 保持 arc_spans 对整圆和零长度圆弧的判断
+        start_angles = np.where(is_arc, self.start_angles + angle, self.start_angles)
+        end_angles = np.where(is_arc, self.end_angles + angle, self.end_angles)
+        starts = self.starts @ matrix
+        ends = self.ends @ matrix
+        is_circle = self.kinds == CIRCLE
+        bottom = arc_points(centers, self.radii, start_angles)
+        starts[is_circle] = bottom[is_circle]
+        ends[is_circle] = bottom[is_circle]
+
+        extmin, extmax = segment_extents(
+            self.kinds, starts, ends, centers, self.radii, start_angles, end_angles
+        )
+
+        return Geometry(
+            self.kinds,
+            starts,
+            ends,
+            centers,
+            self.radii,
+            start_angles,
+            end_angles,
+            self.handles,
+            extmin,
+            extmax,
+        )
+
+    def translate(self, dx, dy):
+        offset = np.array([dx, dy], dtype=np.float64)
+
+        return Geometry(
+            self.kinds,
+            self.starts + offset,
+            self.ends + offset,
+            self.centers + offset,
+            self.radii,
+            self.start_angles,
+            self.end_angles,
+            self.handles,
+            None if self.extmin is None else self.extmin + offset,
+            None if self.extmax is None else self.extmax + offset,
+        )
+
+
+class Contour:
+    """
+    按走刀方向排列的一条封闭轮廓。
+
+    第 k 段从 points[k] 走到 points[k + 1], 圆弧段的圆心为 centers[k],
+    ccw[k] 为真时逆时针(G03), 否则顺时针(G02)。
+    """
+
+    def __init__(self, kinds, points, centers, ccw) -> None:
+        self.kinds = kinds
+        self.points = points
+        self.centers = centers
+        self.ccw = ccw
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def start_point(self):
+        return self.points[0]
+
+    @staticmethod
+    def from_segments(geometry, indices, forwards):
+        indices = np.asarray(indices, dtype=np.intp)
+        forwards = np.asarray(forwards, dtype=bool)[:, None]
+
+        starts = np.where(forwards, geometry.starts[indices], geometry.ends[indices])
+        ends = np.where(forwards, geometry.ends[indices], geometry.starts[indices])
+        points = np.vstack([starts, ends[-1:]])
+
+        return Contour(
+            geometry.kinds[indices].copy(),
+            points,
+            geometry.centers[indices].copy(),
+            forwards[:, 0].copy(),
+        )
+
+    @staticmethod
+    def circle(center, radius):
+        cx, cy = center
+        points = np.array([(cx, cy - radius), (cx, cy + radius), (cx, cy - radius)])
+
+        return Contour(
+            np.array([ARC, ARC], dtype=np.int8),
+            points,
+            np.array([(cx, cy), (cx, cy)], dtype=np.float64),
+            np.array([True, True]),
+        )
+
+    def is_closed(self, epsilon=0.001):
+        # 共边切割拆出的路径不闭合
+        delta = self.points[-1] - self.points[0]
+        return bool(np.hypot(delta[0], delta[1]) < epsilon)
+
+    def lengths(self):
+        # 每一段的长度, 圆弧按转角计算弧长
+        starts = self.points[:-1]
+        ends = self.points[1:]
+        lengths = np.hypot(ends[:, 0] - starts[:, 0], ends[:, 1] - starts[:, 1])
+
+        is_arc = self.kinds == ARC
+        if is_arc.any():
+            radii, a1, sweeps = arc_sweeps(
+                starts[is_arc], ends[is_arc], self.centers[is_arc], self.ccw[is_arc]
+            )
+            lengths[is_arc] = radii * np.abs(sweeps)
+
+        return lengths
+
+    def split(self, distance):
+        """
+        沿走刀方向在 distance 处把轮廓分成前后两段, 返回 (head, tail)。
+        分割点落在圆弧上时按转角比例拆成两段圆弧。
+        """
+        lengths = self.lengths()
+        total = np.concatenate([[0.0], np.cumsum(lengths)])
+        if distance <= 0.0:
+            return (self.slice(0, 0), self)
+        if distance >= total[-1]:
+            return (self, self.slice(len(self), len(self)))
+
+        k = int(np.searchsorted(total, distance, side="right")) - 1
+        t = (distance - total[k]) / lengths[k]
+        start = self.points[k]
+        end = self.points[k + 1]
+
+        if self.kinds[k] == ARC:
+            radii, a1, sweeps = arc_sweeps(
+                start[None], end[None], self.centers[k : k + 1], self.ccw[k : k + 1]
+            )
+            angle = a1[0] + sweeps[0] * t
+            point = self.centers[k] + radii[0] * np.array(
+                [np.cos(angle), np.sin(angle)]
+            )
+        else:
+            point = start + (end - start) * t
+
+        head = self.slice(0, k + 1)
+        head.points = np.vstack([self.points[: k + 1], point])
+        tail = self.slice(k, len(self))
+        tail.points = np.vstack([point, self.points[k + 1 :]])
+        return (head, tail)
+
+    def slice(self, start, end):
+        # 第 start 到 end-1 段组成的(不闭合的)轮廓
+        return Contour(
+            self.kinds[start:end],
+            self.points[start : end + 1],
+            self.centers[start:end],
+            self.ccw[start:end],
+        )
+
+    def rotate(self, k):
+        # 改为从第 k 个顶点开始走刀
+        if k == 0:
+            return self
+
+        vertices = np.roll(self.points[:-1], -k, axis=0)
+        return Contour(
+            np.roll(self.kinds, -k),
+            np.vstack([vertices, vertices[:1]]),
+            np.roll(self.centers, -k, axis=0),
+            np.roll(self.ccw, -k),
+        )
+
+    def reverse(self):
+        return Contour(
+            self.kinds[::-1].copy(),
+            self.points[::-1].copy(),
+            self.centers[::-1].copy(),
+            ~self.ccw[::-1],
+        )
+
+
+def arc_points(centers, radii, angles):
+    radians = np.radians(angles)
+    return centers + radii[:, None] * np.column_stack(
+        [np.cos(radians), np.sin(radians)]
+    )
+
+
+def arc_sweeps(starts, ends, centers, ccw):
+    # 圆弧的半径、起始角和带符号的转角(弧度, 逆时针为正), 起止点重合时为整圆
+    start_vectors = starts - centers
+    end_vectors = ends - centers
+    radii = np.hypot(start_vectors[:, 0], start_vectors[:, 1])
+    a1 = np.arctan2(start_vectors[:, 1], start_vectors[:, 0])
+    a2 = np.arctan2(end_vectors[:, 1], end_vectors[:, 0])
+
+    sweeps = np.where(ccw, a2 - a1, a1 - a2) % (2 * np.pi)
+    sweeps[sweeps == 0.0] = 2 * np.pi
+    return (radii, a1, np.where(ccw, sweeps, -sweeps))
+
+
+def segment_bounds(is_arc, starts, ends, centers, ccw):
+    """
+    每段在 XY 平面上的外包框, 返回 (mins (n, 2), maxs (n, 2))。
+    圆弧方向由 ccw 给出, 起止点重合时为整圆; 转过 0/90/180/270 度象限点的圆弧,
+    外包框扩展到象限点。
+    """
+    mins = np.minimum(starts, ends)
+    maxs = np.maximum(starts, ends)
+    if not is_arc.any():
+        return (mins, maxs)
+
+    centers = centers[is_arc]
+    radii, a1, sweeps = arc_sweeps(starts[is_arc], ends[is_arc], centers, ccw[is_arc])
+    arc_mins = mins[is_arc]
+    arc_maxs = maxs[is_arc]
+    for k, (dx, dy) in enumerate(((1, 0), (0, 1), (-1, 0), (0, -1))):
+        # 从起点沿走刀方向转到象限点的角度不超过转角时, 圆弧经过该象限点
+        turn = np.where(sweeps > 0, k * np.pi / 2 - a1, a1 - k * np.pi / 2)
+        hit = np.mod(turn, 2 * np.pi) <= np.abs(sweeps)
+        point = centers + np.column_stack([dx * radii, dy * radii])
+        arc_mins = np.where(hit[:, None], np.minimum(arc_mins, point), arc_mins)
+        arc_maxs = np.where(hit[:, None], np.maximum(arc_maxs, point), arc_maxs)
+
+    mins[is_arc] = arc_mins
+    maxs[is_arc] = arc_maxs
+    return (mins, maxs)
+
+
+def arc_spans(start_angles, end_angles):
+    # 逆时针转过的角度, 与 ezdxf 一致: 起止角相同为 0, 相差 360 的整数倍为整圆
+    spans = np.mod(end_angles - start_angles, 360.0)
+    full = (spans == 0.0) & (start_angles != end_angles)
+    spans[full] = 360.0
+    return spans
+
+
+def segment_extents(kinds, starts, ends, centers, radii, start_angles, end_angles):
+    """
+    计算所有线段的外包框, 返回 (extmin, extmax)。
+
+    圆弧的极值点只可能是端点或 0/90/180/270 度处的象限点,
+    逐个象限点判断是否落在圆弧角度范围内即可得到精确的外包框。
+    """
+    if len(kinds) == 0:
+        return (None, None)
+
+    xs = [starts[:, 0], ends[:, 0]]
+    ys = [starts[:, 1], ends[:, 1]]
+
+    is_arc = kinds != LINE
+    spans = arc_spans(start_angles, end_angles)
+    spans[kinds == CIRCLE] = 360.0
+
+    for angle, dx, dy in ((0.0, 1, 0), (90.0, 0, 1), (180.0, -1, 0), (270.0, 0, -1)):
+        hit = is_arc & (np.mod(angle - start_angles, 360.0) <= spans)
+        xs.append(np.where(hit, centers[:, 0] + dx * radii, starts[:, 0]))
+        ys.append(np.where(hit, centers[:, 1] + dy * radii, starts[:, 1]))
+
+    xs = np.concatenate(xs)
+    ys = np.concatenate(ys)
+
+    return (np.array([xs.min(), ys.min()]), np.array([xs.max(), ys.max()]))
+
+
+def bulge_arcs(starts, ends, bulges):
+    # 与 ezdxf.math.bulge_to_arc 相同的换算, 负凸度的圆弧交换起止角, 保持逆时针
+    delta = ends - starts
+    chords = np.hypot(delta[:, 0], delta[:, 1])
+    signed_radii = chords * (1.0 + bulges * bulges) / 4.0 / bulges
+    directions = np.arctan2(delta[:, 1], delta[:, 0]) + (
+        np.pi / 2 - np.arctan(bulges) * 2
+    )
+    centers = starts + signed_radii[:, None] * np.column_stack(
+        [np.cos(directions), np.sin(directions)]
+    )
+
+    start_angles = np.degrees(
+        np.arctan2(starts[:, 1] - centers[:, 1], starts[:, 0] - centers[:, 0])
+    )
+    end_angles = np.degrees(
+        np.arctan2(ends[:, 1] - centers[:, 1], ends[:, 0] - centers[:, 0])
+    )
+    negative = bulges < 0
+    start_angles, end_angles = (
+        np.where(negative, end_angles, start_angles),
+        np.where(negative, start_angles, end_angles),
+    )
+
+    return (centers, np.abs(signed_radii), start_angles, end_angles)
+
+
+def polyline_segments(polyline):
+    vertices = np.array(polyline.get_points("xyb"), dtype=np.float64).reshape(-1, 3)
+    if polyline.closed and len(vertices) > 1:
+        vertices = np.vstack([vertices, vertices[:1]])
+
+    return bulge_segments(vertices)
+
+
+def curve_segments(curve, tolerance=CURVE_TOLERANCE):
+    # ELLIPSE 和 SPLINE 先用双圆弧拟合成带凸度的顶点, 再按多段线展开
+    return bulge_segments(curve_vertices(curve, tolerance))
+
+
+def bulge_segments(vertices):
+    """
+    把 (x, y, 凸度) 顶点数组展开成线段数组,
+    顺序与 Geometry 的列相同: (类型, 起点, 终点, 圆心, 半径, 起始角, 终止角)。
+    凸度不为 0 的线段是圆弧, 圆弧的起止点按逆时针方向排列,
+    所以负凸度的圆弧起点是后一个顶点, 链接轮廓时会反向走成 G02。
+    """
+    # 去掉重复顶点产生的零长度线段
+    delta = vertices[1:, 0:2] - vertices[:-1, 0:2]
+    keep = np.hypot(delta[:, 0], delta[:, 1]) > 1e-9
+
+    starts = vertices[:-1, 0:2][keep]
+    ends = vertices[1:, 0:2][keep]
+    bulges = vertices[:-1, 2][keep]
+    n = len(starts)
+
+    kinds = np.full(n, LINE, dtype=np.int8)
+    centers = np.zeros((n, 2))
+    radii = np.zeros(n)
+    start_angles = np.zeros(n)
+    end_angles = np.zeros(n)
+
+    is_arc = bulges != 0.0
+    if is_arc.any():
+        kinds[is_arc] = ARC
+        (
+            centers[is_arc],
+            radii[is_arc],
+            start_angles[is_arc],
+            end_angles[is_arc],
+        ) = bulge_arcs(starts[is_arc], ends[is_arc], bulges[is_arc])
+
+        negative = bulges < 0
+        starts, ends = (
+            np.where(negative[:, None], ends, starts),
+            np.where(negative[:, None], starts, ends),
+        )
+
+    return (kinds, starts, ends, centers, radii, start_angles, end_angles)
+
+
+def point_segment_distance(points, a, b):
+    # 点到线段 ab 的距离, a 与 b 重合时退化为点到点的距离
+    ab = b - a
+    length2 = float(ab @ ab)
+    if length2 == 0.0:
+        delta = points - a
+    else:
+        t = np.clip(((points - a) @ ab) / length2, 0.0, 1.0)
+        delta = points - (a + t[:, None] * ab)
+
+    return np.hypot(delta[:, 0], delta[:, 1])
+
+
+def line_runs(kinds):
+    # 连续直线段的区间 [start, end), 圆弧段把它们隔开
+    is_line = np.concatenate([[0], (kinds == LINE).view(np.int8), [0]])
+    edges = np.flatnonzero(np.diff(is_line))
+    return zip(edges[0::2].tolist(), edges[1::2].tolist())
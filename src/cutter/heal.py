@@ -0,0 +1,203 @@
+import numpy as np
+
+from cutter.geometry import ARC, CIRCLE, LINE, Geometry, segment_extents
+
+# 默认的端点合并容差(mm), 大于该距离的缺口不自动修补
+HEAL_TOLERANCE = 0.05
+# 链接轮廓时端点重合的容差(mm), 与 GCode.is_same_point 一致; 已经连上的端点不修补
+JOIN_TOLERANCE = 0.001
+# 网格键中 x 格号的倍数, y 格号的绝对值必须小于它的一半
+CELL_STRIDE = 1 << 32
+
+
+class HealedGap:
+    """一处被修补的缺口: 端点合并到 (x, y), distance 是端点移动的最大距离"""
+
+    def __init__(self, x, y, distance, count) -> None:
+        self.x = x
+        self.y = y
+        self.distance = distance
+        self.count = count
+
+    def __str__(self):
+        return "({:.3f}, {:.3f}) {}个端点, 最大移动 {:.4f}mm".format(
+            self.x, self.y, self.count, self.distance
+        )
+
+
+def close_pairs(points, tolerance):
+    """
+    用边长等于容差的哈希网格找出距离小于容差的点对 (i, j), i < j。
+    每个点只需要和所在格子及周围 8 个格子里的点比较, 全部用 numpy 完成。
+    """
+    cells = np.floor(points / tolerance).astype(np.int64)
+    keys = cells[:, 0] * CELL_STRIDE + cells[:, 1]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    pairs = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbors = keys + dx * CELL_STRIDE + dy
+            lo = np.searchsorted(sorted_keys, neighbors, side="left")
+            hi = np.searchsorted(sorted_keys, neighbors, side="right")
+            counts = hi - lo
+            if counts.sum() == 0:
+                continue
+
+            i = np.repeat(np.arange(len(points)), counts)
+            # 每个点对应的区间 [lo, hi) 展开成连续的下标
+            first = np.cumsum(counts) - counts
+            j = order[np.repeat(lo - first, counts) + np.arange(len(i))]
+            pairs.append(np.column_stack([i, j]))
+
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    pairs = np.vstack(pairs)
+    pairs = pairs[pairs[:, 0] < pairs[:, 1]]
+    delta = points[pairs[:, 0]] - points[pairs[:, 1]]
+    return pairs[np.hypot(delta[:, 0], delta[:, 1]) < tolerance]
+
+
+def connected_labels(count, pairs):
+    # 连通分量, 每个点的标签是所在分量中最小的下标
+    labels = np.arange(count)
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, pairs[:, 0], labels[pairs[:, 1]])
+        np.minimum.at(labels, pairs[:, 1], labels[pairs[:, 0]])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def heal_gaps(geometry, tolerance=HEAL_TOLERANCE):
+    """
+    把距离小于 tolerance 的悬空端点合并到它们的平均位置,
+    返回 (新的 Geometry, [HealedGap])。
+
+    只修补悬空的端点, 即 JOIN_TOLERANCE 以内没有其他线段端点的端点;
+    已经连上的端点(例如细分曲线的顶点)保持不动。距离小于容差的端点对会传递地连成一组,
+    合并时端点移动超过 tolerance 的组不修补。
+    同一段的两个端点不直接合并; 合并后两端重合的短线段和短圆弧被删除,
+    两端重合的长圆弧改为整圆。端点移动过的圆弧保持半径不变,
+    圆心沿弦的中垂线重新计算, 保证起点和终点到圆心的距离一致。
+    """
+    n = len(geometry)
+    segments = np.flatnonzero(geometry.kinds != CIRCLE)
+    if len(segments) == 0:
+        return (geometry, [])
+
+    # 前一半是起点, 后一半是终点
+    m = len(segments)
+    points = np.vstack([geometry.starts[segments], geometry.ends[segments]])
+    joined = close_pairs(points, JOIN_TOLERANCE)
+    joined = joined[joined[:, 1] - joined[:, 0] != m]
+    dangling = np.ones(2 * m, dtype=bool)
+    dangling[joined.ravel()] = False
+
+    pairs = close_pairs(points, tolerance)
+    pairs = pairs[
+        (pairs[:, 1] - pairs[:, 0] != m) & dangling[pairs[:, 0]] & dangling[pairs[:, 1]]
+    ]
+    labels = connected_labels(2 * m, pairs)
+
+    sums = np.zeros((2 * m, 2))
+    np.add.at(sums, labels, points)
+    counts = np.bincount(labels, minlength=2 * m)
+    snapped = sums[labels] / counts[labels][:, None]
+
+    moves = np.hypot(*(snapped - points).T)
+    distances = np.zeros(2 * m)
+    np.maximum.at(distances, labels, moves)
+
+    # 传递连成的组可能比容差大得多, 这样的组保持原样
+    rejected = distances[labels] > tolerance
+    snapped[rejected] = points[rejected]
+    moves[rejected] = 0.0
+    distances[distances > tolerance] = 0.0
+
+    gaps = []
+    for label in np.flatnonzero((distances > 1e-9) & (counts > 1)).tolist():
+        x, y = (sums[label] / counts[label]).tolist()
+        gaps.append(HealedGap(x, y, float(distances[label]), int(counts[label])))
+
+    if not gaps:
+        return (geometry, [])
+
+    kinds = geometry.kinds.copy()
+    starts = geometry.starts.copy()
+    ends = geometry.ends.copy()
+    centers = geometry.centers.copy()
+    radii = geometry.radii.copy()
+    start_angles = geometry.start_angles.copy()
+    end_angles = geometry.end_angles.copy()
+    starts[segments] = snapped[:m]
+    ends[segments] = snapped[m:]
+
+    keep = np.ones(n, dtype=bool)
+    closed = segments[(labels[:m] == labels[m:]) & ~rejected[:m]]
+    for i in closed.tolist():
+        length = geometry.radii[i] * np.radians(
+            (geometry.end_angles[i] - geometry.start_angles[i]) % 360.0
+        )
+        if kinds[i] == LINE or length < tolerance:
+            keep[i] = False
+        else:
+            kinds[i] = CIRCLE
+            start_angles[i] = end_angles[i] = 270.0
+            starts[i] = ends[i] = centers[i] + (0.0, -radii[i])
+
+    moved = segments[(moves[:m] > 1e-9) | (moves[m:] > 1e-9)]
+    arcs = moved[(kinds[moved] == ARC) & keep[moved]]
+    if len(arcs) > 0:
+        centers[arcs], radii[arcs] = refit_arc_centers(
+            starts[arcs], ends[arcs], centers[arcs], radii[arcs]
+        )
+        start_angles[arcs] = arc_angles(starts[arcs], centers[arcs])
+        end_angles[arcs] = arc_angles(ends[arcs], centers[arcs])
+
+    extmin, extmax = segment_extents(
+        kinds[keep],
+        starts[keep],
+        ends[keep],
+        centers[keep],
+        radii[keep],
+        start_angles[keep],
+        end_angles[keep],
+    )
+    handles = [h for h, k in zip(geometry.handles, keep.tolist()) if k]
+    healed = Geometry(
+        kinds[keep],
+        starts[keep],
+        ends[keep],
+        centers[keep],
+        radii[keep],
+        start_angles[keep],
+        end_angles[keep],
+        handles,
+        extmin,
+        extmax,
+    )
+    return (healed, gaps)
+
+
+def refit_arc_centers(starts, ends, centers, radii):
+    # 过新的起点和终点、半径不变的圆有两个, 取离原圆心近的那个; 弦长超过直径时半径取半弦长
+    middle = (starts + ends) / 2
+    chord = ends - starts
+    half = np.hypot(chord[:, 0], chord[:, 1]) / 2
+    radii = np.maximum(radii, half)
+    normal = np.column_stack([-chord[:, 1], chord[:, 0]])
+    normal /= np.where(half > 0, 2 * half, 1.0)[:, None]
+
+    distance = np.sqrt(np.maximum(radii**2 - half**2, 0.0))
+    side = np.sign(np.sum((centers - middle) * normal, axis=1))
+    side[side == 0] = 1.0
+    return (middle + normal * (side * distance)[:, None], radii)
+
+
+def arc_angles(points, centers):
+    delta = points - centers
+    return np.degrees(np.arctan2(delta[:, 1], delta[:, 0])) % 360.0
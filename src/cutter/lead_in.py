@@ -0,0 +1,261 @@
+import numpy as np
+
+from cutter.containment import BoxIndex, contour_polygon, signed_area
+from cutter.feed import segment_tangents
+
+# 下刀点到轮廓起点的最大距离(mm)
+LEAD_IN_LENGTH = 10.0
+# 下刀点离轮廓至少再留出的距离(mm)
+LEAD_IN_MARGIN = 0.1
+# 沿下刀方向从最大距离开始逐步缩短的次数
+LEAD_IN_STEPS = 20
+
+
+def start_tangents(contour):
+    # 第一段起点和最后一段终点处的单位切向, 只算首尾两段
+    last = len(contour) - 1
+    entry, _ = segment_tangents(contour.slice(0, 1))
+    _, exit = segment_tangents(contour.slice(last, last + 1))
+    return (entry[0], exit[0])
+
+
+def scrap_direction(contour):
+    """
+    起点处指向废料一侧的单位向量。外轮廓逆时针、孔顺时针走刀,
+    废料都在走刀方向的右侧(G42 的补偿侧); 起点是拐角时取前后两段右法向的角平分线。
+    """
+    entry, exit = start_tangents(contour)
+    outgoing = np.array([entry[1], -entry[0]])
+    incoming = np.array([exit[1], -exit[0]])
+    direction = outgoing + incoming
+    length = float(np.hypot(*direction))
+    if length < 1e-6:
+        # 原路折返的尖角, 只能按后一段的法向
+        return outgoing
+    return direction / length
+
+
+def lead_in_directions(contour):
+    """
+    依次尝试的下刀方向: 先是 scrap_direction, 被相邻零件挡住时再试
+    前后两段的右法向, 最后沿进入起点的切线往回退(相邻零件间距正好是切缝宽度时,
+    只能顺着切缝切入)。
+    """
+    entry, exit = start_tangents(contour)
+    directions = [
+        scrap_direction(contour),
+        np.array([entry[1], -entry[0]]),
+        np.array([exit[1], -exit[0]]),
+        -exit,
+    ]
+    unique = []
+    for direction in directions:
+        # 与 np.allclose 相同的比较, 只是少了通用检查的开销
+        if not any(np.all(abs(direction - d) <= 1e-8 + 1e-5 * abs(d)) for d in unique):
+            unique.append(direction)
+    return unique
+
+
+class PartBoxes:
+    """
+    各轮廓的多边形和包围盒的网格索引, 找下刀点时取出下刀点附近的其他轮廓,
+    下刀点不能落在它们的材料上, 切入线也不能穿过它们。
+    """
+
+    def __init__(self, polygons):
+        self.polygons = polygons
+        boxes = [(*p.min(axis=0), *p.max(axis=0)) for p in polygons]
+        self.index = BoxIndex(np.array(boxes, dtype=np.float64).reshape(-1, 4))
+
+    def near(self, k, low, high):
+        """除第 k 个轮廓外, 包围盒与矩形 [low, high] 相交的多边形"""
+        return [self.polygons[i] for i in self.index.overlapping(low, high) if i != k]
+
+
+def polygon_edges(polygon, low, high):
+    """多边形中与矩形 [low, high] 相交的边, 返回各边的起点和终点"""
+    ends = np.concatenate([polygon[1:], polygon[:1]])
+    return edges_in_box(polygon, ends, low, high)
+
+
+def edges_in_box(starts, ends, low, high):
+    # 起点和终点分别为 starts/ends 的各边中, 与矩形 [low, high] 相交的边
+    mask = np.all(np.maximum(starts, ends) >= low, axis=1) & np.all(
+        np.minimum(starts, ends) <= high, axis=1
+    )
+    return starts[mask], ends[mask]
+
+
+def polygons_cross(a, b):
+    """
+    两个多边形是否有边相交(图纸上重叠的轮廓)。共线和相切不算,
+    只比较落在对方包围盒内的边。
+    """
+
+    def cross(u, v):
+        return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+    a1, a2 = polygon_edges(a, b.min(axis=0), b.max(axis=0))
+    b1, b2 = polygon_edges(b, a.min(axis=0), a.max(axis=0))
+    if len(a1) == 0 or len(b1) == 0:
+        return False
+
+    da = (a2 - a1)[:, None]
+    db = (b2 - b1)[None]
+    d1 = cross(da, b1[None] - a1[:, None])
+    d2 = cross(da, b2[None] - a1[:, None])
+    d3 = cross(db, a1[:, None] - b1[None])
+    d4 = cross(db, a2[:, None] - b1[None])
+    return bool(np.any((d1 * d2 < 0) & (d3 * d4 < 0)))
+
+
+def edge_distances(points, starts, ends):
+    # 各点到各边的最短距离, 没有边时为 inf
+    if len(starts) == 0:
+        return np.full(len(points), np.inf)
+    deltas = ends - starts
+    offsets = points[:, None] - starts
+    squared = np.maximum(np.sum(deltas**2, axis=1), 1e-18)
+    t = np.clip(np.sum(offsets * deltas, axis=2) / squared, 0.0, 1.0)
+    nearest = offsets - deltas * t[..., None]
+    return np.min(np.hypot(nearest[..., 0], nearest[..., 1]), axis=1)
+
+
+def ray_crossings(points, starts, ends):
+    # 各点向 +x 方向的射线穿过的边数, 与 point_in_polygon 相同
+    px = points[:, 0, None]
+    py = points[:, 1, None]
+    x1, y1 = starts[:, 0], starts[:, 1]
+    x2, y2 = ends[:, 0], ends[:, 1]
+    crosses = (y1 > py) != (y2 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(crosses & (px < x), axis=1)
+
+
+def segments_cross_edges(a, b, starts, ends):
+    # 各条线段 a-b 是否与某条边相交, 与 segment_crosses_edges 相同
+    ax, ay = a[:, 0, None], a[:, 1, None]
+    bx, by = b[:, 0, None], b[:, 1, None]
+    x1, y1 = starts[:, 0], starts[:, 1]
+    x2, y2 = ends[:, 0], ends[:, 1]
+
+    dx = bx - ax
+    dy = by - ay
+    d1 = dx * (y1 - ay) - dy * (x1 - ax)
+    d2 = dx * (y2 - ay) - dy * (x2 - ax)
+    ex = x2 - x1
+    ey = y2 - y1
+    d3 = ex * (ay - y1) - ey * (ax - x1)
+    d4 = ex * (by - y1) - ey * (bx - x1)
+    return np.any((d1 * d2 < 0) & (d3 * d4 < 0), axis=1)
+
+
+def boundary_distance(point, polygon):
+    # 点到多边形各边的最短距离
+    starts = polygon
+    deltas = np.roll(polygon, -1, axis=0) - polygon
+    offsets = point - starts
+    squared = np.maximum(np.sum(deltas**2, axis=1), 1e-18)
+    t = np.clip(np.sum(offsets * deltas, axis=1) / squared, 0.0, 1.0)
+    return float(np.min(np.hypot(*(offsets - deltas * t[:, None]).T)))
+
+
+def polygon_centroid(polygon):
+    x = polygon[:, 0]
+    y = polygon[:, 1]
+    cross = x * np.roll(y, -1) - np.roll(x, -1) * y
+    area = cross.sum() / 2
+    if abs(area) < 1e-12:
+        return polygon.mean(axis=0)
+    cx = np.sum((x + np.roll(x, -1)) * cross) / (6 * area)
+    cy = np.sum((y + np.roll(y, -1)) * cross) / (6 * area)
+    return np.array([cx, cy])
+
+
+def lead_in_point(
+    contour,
+    clearance=0.0,
+    length=LEAD_IN_LENGTH,
+    bounds=None,
+    parts=None,
+    part=None,
+    polygon=None,
+):
+    """
+    闭合轮廓的下刀点, 找不到时返回 None。
+
+    下刀点必须在轮廓的废料一侧(外轮廓之外, 孔之内), 离轮廓至少 clearance + LEAD_IN_MARGIN,
+    并且直线切入起点时不穿过轮廓。沿 lead_in_directions 的各个方向从 length 开始逐步缩短,
+    都不满足时(窄孔)再试孔的形心, 即从中心直线切入起点。
+    bounds 是允许的范围 ((xmin, ymin), (xmax, ymax)), 例如机床行程, 下刀点不能超出。
+    parts 是各轮廓的 PartBoxes, part 是本轮廓在其中的序号。下刀点附近的其他轮廓是障碍:
+    下刀点同样要离它们至少 clearance + LEAD_IN_MARGIN,
+    连同本轮廓在内被偶数个轮廓包含(落在废料上), 切入线也不能穿过它们。
+    与本轮廓相交的轮廓(图纸上重叠)切割时本来就会互相切到, 不作为障碍。
+    polygon 是 contour 展开的多边形, 已经算过时传入, 不再重复展开。
+    """
+    if polygon is None:
+        polygon = contour_polygon(contour)
+    start = contour.start_point
+    # 逆时针的外轮廓废料在外面, 顺时针的孔废料在里面
+    inside = signed_area(polygon) < 0
+    margin = clearance + LEAD_IN_MARGIN
+
+    directions = np.array(lead_in_directions(contour))
+    steps = length * np.arange(LEAD_IN_STEPS, 0, -1) / LEAD_IN_STEPS
+    candidates = (start + directions[:, None] * steps[:, None]).reshape(-1, 2)
+
+    # 沿各方向的点都在起点附近, 一起检查; 都不满足时再试远处的形心
+    usable = usable_points(
+        candidates, start, polygon, inside, margin, bounds, parts, part
+    )
+    if not usable.any():
+        candidates = polygon_centroid(polygon)[None]
+        usable = usable_points(
+            candidates, start, polygon, inside, margin, bounds, parts, part
+        )
+        if not usable.any():
+            return None
+
+    point = candidates[np.argmax(usable)]
+    return (float(point[0]), float(point[1]))
+
+
+def usable_points(points, start, polygon, inside, margin, bounds, parts, part):
+    """
+    lead_in_point 的各项条件, 对一组候选点一起检查。
+    离候选点和起点的范围超过 margin 的边不会影响结果, 只取出范围内的边和附近的轮廓;
+    判断点在多边形内用 +x 方向的射线, 范围右侧的边也要保留。
+    """
+    delta = points - start
+    distances = np.hypot(delta[:, 0], delta[:, 1])
+    usable = distances >= LEAD_IN_MARGIN
+    if bounds is not None:
+        usable &= np.all(points >= bounds[0], axis=1)
+        usable &= np.all(points <= bounds[1], axis=1)
+    # 起点在轮廓上, 留出一点距离再判断切入线是否穿过轮廓
+    scale = LEAD_IN_MARGIN / 2 / np.maximum(distances, LEAD_IN_MARGIN)
+    near = start + delta * scale[:, None]
+
+    low = np.minimum(points.min(axis=0), start) - margin
+    high = np.maximum(points.max(axis=0), start) + margin
+    obstacles = [] if parts is None else parts.near(part, low, high)
+    obstacles = [o for o in obstacles if not polygons_cross(polygon, o)]
+
+    covered = np.zeros(len(points), dtype=int)
+    for k, other in enumerate([polygon] + obstacles):
+        if not usable.any():
+            break
+        starts, ends = polygon_edges(other, low, (np.inf, high[1]))
+        contains = ray_crossings(points, starts, ends) % 2 == 1
+        if k == 0:
+            usable &= contains == inside
+        else:
+            covered += contains
+        starts, ends = edges_in_box(starts, ends, low, high)
+        usable &= edge_distances(points, starts, ends) >= margin
+        usable &= ~segments_cross_edges(near, points, starts, ends)
+
+    # 连同本轮廓在内被偶数个轮廓包含, 落在废料上
+    return usable & ((covered + inside) % 2 == 0)
@@ -0,0 +1,82 @@
+import numpy as np
+
+# 空行程起点沿行程方向让开的距离(mm), 刚切完的轮廓边界不算经过已切割区域
+DEPARTURE_MARGIN = 0.1
+
+
+def segment_crosses_polygon(start, end, polygon):
+    """线段 start-end 是否进入多边形内部: 端点在多边形内, 或与某条边相交"""
+    bx, by = end
+    x1 = polygon[:, 0]
+    y1 = polygon[:, 1]
+    x2 = np.roll(x1, -1)
+    y2 = np.roll(y1, -1)
+
+    # 终点在多边形内(射线法)
+    crosses = (y1 > by) != (y2 > by)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = x1 + (by - y1) * (x2 - x1) / (y2 - y1)
+    if np.count_nonzero(crosses & (bx < x)) % 2:
+        return True
+
+    return segment_crosses_edges(start, end, polygon)
+
+
+def segment_crosses_edges(start, end, polygon):
+    """线段 start-end 是否与多边形的某条边相交: 两条线段的端点分别位于对方两侧"""
+    ax, ay = start
+    bx, by = end
+    x1 = polygon[:, 0]
+    y1 = polygon[:, 1]
+    x2 = np.roll(x1, -1)
+    y2 = np.roll(y1, -1)
+
+    dx = bx - ax
+    dy = by - ay
+    d1 = dx * (y1 - ay) - dy * (x1 - ax)
+    d2 = dx * (y2 - ay) - dy * (x2 - ax)
+    ex = x2 - x1
+    ey = y2 - y1
+    d3 = ex * (ay - y1) - ey * (ax - x1)
+    d4 = ex * (by - y1) - ey * (bx - x1)
+    return bool(np.any((d1 * d2 < 0) & (d3 * d4 < 0)))
+
+
+class LinkPlanner:
+    """
+    记录已经切完的轮廓区域。切下来的零件或废料可能翘起,
+    空行程经过这些区域时要抬到安全高度, 其余情况可以在较低的平面上移动。
+    """
+
+    def __init__(self) -> None:
+        self.polygons = []
+        self.boxes = np.empty((0, 4))
+
+    def add(self, polygon):
+        self.polygons.append(polygon)
+        box = [*polygon.min(axis=0), *polygon.max(axis=0)]
+        self.boxes = np.vstack([self.boxes, box])
+
+    def crosses(self, start, end):
+        """从 start 到 end 的直线行程是否经过已切割区域"""
+        start = np.asarray(start, dtype=np.float64)
+        end = np.asarray(end, dtype=np.float64)
+        length = float(np.hypot(*(end - start)))
+        if length > DEPARTURE_MARGIN:
+            start = start + (end - start) * (DEPARTURE_MARGIN / length)
+
+        # 先用外包框过滤, 只对外包框相交的轮廓做精确判断
+        low = np.minimum(start, end)
+        high = np.maximum(start, end)
+        candidates = np.flatnonzero(
+            (self.boxes[:, 0] <= high[0])
+            & (low[0] <= self.boxes[:, 2])
+            & (self.boxes[:, 1] <= high[1])
+            & (low[1] <= self.boxes[:, 3])
+        )
+
+        for i in candidates.tolist():
+            if segment_crosses_polygon(start, end, self.polygons[i]):
+                return True
+
+        return False
@@ -1,4 +1,5 @@
 import os
+import shutil
 from typing import Optional
 
 import ezdxf
@@ -29,20 +30,28 @@ from qtpy.QtWidgets import (
 
 from cutter.about_dialog import AboutUsDialog
 from cutter.axis_timer import axis_timer
-from cutter.database import DXF_PATH
+from cutter.database import DXF_PATH, NC_CACHE_PATH
 from cutter.error_info_widget import ErrorInfo
 from cutter.error_report_timer import error_report_timer
 from cutter.cad_widget import CADGraphicsView, DxfEntityScence
-from cutter.consts import SUPPORTED_ENTITY_TYPES
+from cutter.consts import ALIGNMENT, MACHINE_TRAVEL, SUPPORTED_ENTITY_TYPES
 from cutter.entity_tree import EntityTree
 from cutter.gcode import GCode
 from cutter.gcode_dialog import GCodeDialog
+from cutter.geometry import Geometry
 from cutter.joy import JoyDialog
 from cutter.machine_info import MachineInfo
 from cutter.models import Recipe
-from cutter.plc import PLC_CONN, reset_machine
+from cutter.plc import PLC_CONN, read_axis, reset_machine
+from cutter.program_cache import (
+    ProgramCache,
+    file_digest,
+    program_key,
+    quantize_position,
+)
 from cutter.recipe import RecipeCombo, RecipeDialg
 from cutter.users import UsersDialog
+from cutter.validation import validate_program
 
 
 class MainWindow(QMainWindow):
@@ -50,6 +59,10 @@ class MainWindow(QMainWindow):
         super().__init__()
 
         self.dxf_entities = []
+        self.geometry = Geometry.from_entities([])
+        # 当前 dxf 文件内容的摘要, 用作程序缓存键的一部分
+        self.dxf_digest = None
+        self.program_cache = ProgramCache(NC_CACHE_PATH)
         self.machine_info = MachineInfo(self)
         axis_timer.addObserver(self.machine_info)
         self._init_toolbar()
@@ -175,6 +188,7 @@ class MainWindow(QMainWindow):
                     auditor = doc.audit()
 
                 self.set_document(doc, auditor)
+                self.dxf_digest = file_digest(path)
             except IOError as e:
                 QMessageBox.critical(self, "Loading Error", str(e))
             except DXFStructureError as e:
@@ -190,6 +204,7 @@ class MainWindow(QMainWindow):
         doc.modelspace()
         self.doc = doc
         self.dxf_entities = doc.modelspace().query(" ".join(SUPPORTED_ENTITY_TYPES))
+        self.geometry = Geometry.from_entities(self.dxf_entities)
 
         # draw entity view
         self.scene = DxfEntityScence(self.dxf_entities)
@@ -203,6 +218,8 @@ class MainWindow(QMainWindow):
     def set_empty_document(self):
         self.doc = None
         self.dxf_entities = []
+        self.geometry = Geometry.from_entities([])
+        self.dxf_digest = None
 
         # draw entity view
         self.scene = DxfEntityScence(self.dxf_entities)
@@ -245,34 +262,18 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Warning", "没有可用的dxf实体!")
             return
 
-        gcode = ""
+        path = "c:\\TWinCAT\\Mc\\Nci\\cutter.nc"
         try:
-            tool_radius = self.tool_radius.value()
-            cutter_offset = self.cutter_offset.value()
-            cutter_deepth = self.cutter_deepth.value()
-            rotation_speed = self.rotation_speed.value()
-            generator = GCode(
-                self.dxf_entities,
-                tool_radius,
-                cutter_offset,
-                rotation_speed,
-                cutter_deepth,
-            )
-            gcode = generator.generate()
+            program_path = self._get_program()
+            # 上传前检查整个程序, 不要等到 NC 执行到一半才报错
+            with open(program_path) as file:
+                validate_program(file)
+            self._write_nc_file(program_path, path)
         except Exception as e:
             QMessageBox.warning(self, "Warning", e.args[0])
             # raise e
             return
 
-        path = "c:\\TWinCAT\\Mc\\Nci\\cutter.nc"
-        directory = os.path.dirname(path)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-        file = open(path, "w")
-
-        file.write(gcode)
-        file.close()
-
         if PLC_CONN.is_open:
             path = ""
             strGFileName = PLC_CONN.write_by_name(
@@ -290,21 +291,57 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.warning(self, "Warning", "PLC 未连接")
 
+    def _tool_params(self):
+        return {
+            "tool_radius": self.tool_radius.value(),
+            "cutter_offset": self.cutter_offset.value(),
+            "rotation_speed": self.rotation_speed.value(),
+            "cutter_deepth": self.cutter_deepth.value(),
+        }
+
+    def _get_program(self):
+        # 同一 dxf、同样的刀具参数、对刀位置、主轴位置和机床行程直接使用缓存的程序, 不再重新生成
+        params = self._tool_params()
+        alignment = dict(ALIGNMENT)
+        # 从主轴当前所在的位置出发选择下刀点, 第一段空行程最短;
+        # 只有缓存键用取整后的位置, 主轴只移动了一点时仍然命中缓存
+        start_position = None
+        cached_position = None
+        if PLC_CONN.is_open:
+            start_position = read_axis()[:2]
+            cached_position = quantize_position(start_position)
+        key = program_key(
+            self.dxf_digest,
+            dict(params, start_position=cached_position, travel=MACHINE_TRAVEL),
+            alignment,
+        )
+        program_path = self.program_cache.get(key)
+        if program_path is None:
+            generator = GCode(
+                self.geometry,
+                alignment=alignment,
+                start_position=start_position,
+                **params,
+            )
+            program_path = self.program_cache.put(key, generator.write_to)
+
+        return program_path
+
+    def _write_nc_file(self, program_path, path):
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # 先复制到临时文件再替换, 控制器不会读到半个程序
+        tmp_path = path + ".tmp"
+        shutil.copyfile(program_path, tmp_path)
+        os.replace(tmp_path, path)
+
     def _open_gcode_dialog(self):
         gcode = ""
         try:
-            tool_radius = self.tool_radius.value()
-            cutter_offset = self.cutter_offset.value()
-            cutter_deepth = self.cutter_deepth.value()
-            rotation_speed = self.rotation_speed.value()
-            generator = GCode(
-                self.dxf_entities,
-                tool_radius,
-                cutter_offset,
-                rotation_speed,
-                cutter_deepth,
-            )
-            gcode = generator.generate()
+            with open(self._get_program()) as file:
+                gcode = file.read()
         except Exception as e:
             QMessageBox.warning(self, "Warning", e.args[0])
             # @todo
@@ -0,0 +1,201 @@
+from typing import List
+from typing import Optional
+
+import numpy as np
+
+MOTION_NAMES = {0: "G00", 1: "G01", 2: "G02", 3: "G03"}
+COMPACT_MOTION_NAMES = {0: "G0", 1: "G1", 2: "G2", 3: "G3"}
+
+
+def fill_templates(templates, keys, columns):
+    """
+    按模板批量生成各段文本。keys[k] 是第 k 段所用模板的编号,
+    columns 是各段依次填入模板的值 (n, m), 模板用不到的列不填。
+    同一模板的各段拼成一个字符串, 用一次 % 格式化。
+    """
+    lines: List[Optional[str]] = [None] * len(keys)
+    for key in np.unique(keys).tolist():
+        template, used = templates[key]
+        rows = np.flatnonzero(keys == key)
+        values = columns[rows][:, used].ravel().tolist()
+        text = ("\n".join([template] * len(rows))) % tuple(values)
+        for row, line in zip(rows.tolist(), text.split("\n")):
+            lines[row] = line
+    return lines
+
+
+class FixedFormatter:
+    """每段都写出完整的 G 代码和坐标, 数值固定保留 precision 位小数"""
+
+    def __init__(self, precision=3) -> None:
+        self.precision = precision
+        self.spec = f"%.{precision}f"
+        self.templates = {}
+
+    def reset(self):
+        pass
+
+    def template(self, motion, axes, is_arc):
+        # 各种地址字组合的模板只拼一次, 之后每段只做一次 % 格式化
+        key = (motion, axes, is_arc)
+        template = self.templates.get(key)
+        if template is None:
+            spec = self.spec
+            words = [MOTION_NAMES[motion]]
+            for letter, given in zip("XYZ", axes):
+                if given:
+                    words.append(letter + spec)
+            if is_arc:
+                words.append(f"I{spec}  J{spec}")
+            template = " ".join(words)
+            self.templates[key] = template
+        return template
+
+    def block(self, motion, x=None, y=None, z=None, i=None, j=None, comment=None):
+        values = [v for v in (x, y, z, i, j) if v is not None]
+        axes = (x is not None, y is not None, z is not None)
+        text = self.template(motion, axes, i is not None)
+        text = text % tuple(values)
+        if comment is not None:
+            text += f" ({comment})"
+        return text
+
+    def blocks(self, motions, points, zs, offsets):
+        """
+        一次格式化一串 G01/G02/G03 段。points 是各段终点 (n, 2), zs 中 nan 表示不写 Z,
+        offsets 是圆弧的 I/J (n, 2), 直线为 nan。
+        """
+        has_z = ~np.isnan(zs)
+        is_arc = ~np.isnan(offsets[:, 0])
+        keys = motions * 4 + has_z * 2 + is_arc
+        templates = {}
+        for key in np.unique(keys).tolist():
+            motion, z, arc = key // 4, bool(key & 2), bool(key & 1)
+            used = [0, 1] + ([2] if z else []) + ([3, 4] if arc else [])
+            templates[key] = (self.template(motion, (True, True, z), arc), used)
+        columns = np.column_stack([points, zs, offsets])
+        return fill_templates(templates, keys, columns)
+
+
+class CompactFormatter:
+    """
+    紧凑输出: 运动指令与上一段相同时省略 G 代码, 坐标没有变化时省略该轴,
+    数值去掉末尾的 0, 不输出注释。圆弧始终写出 X/Y 和 I/J。
+    模态状态只记录本格式化器输出过的段, 程序中插入其他运动指令后要调用 reset。
+    """
+
+    def __init__(self, precision=3) -> None:
+        self.precision = precision
+        self.spec = f"%.{precision}f"
+        self.reset()
+
+    def reset(self):
+        self.motion = None
+        self.position: List[Optional[str]] = [None, None, None]
+
+    def words(self, letter, values):
+        """
+        整列数值一次格式化成 " X12.5" 形式的地址字(前面带一个空格)。
+        每个地址字后面都是换行, 用整段文本的替换去掉末尾的 0:
+        每个数值正好有 precision 位小数, 替换 precision 次不会去掉整数部分的 0。
+        """
+        if len(values) == 0:
+            return []
+        prefix = " " + letter
+        text = (prefix + self.spec + "\n") * len(values) % tuple(values)
+        if self.precision > 0:
+            for _ in range(self.precision):
+                text = text.replace("0\n", "\n")
+            text = text.replace(".\n", "\n")
+        text = text.replace(prefix + "-0\n", prefix + "0\n")
+        return text[:-1].split("\n")
+
+    def number(self, value):
+        return self.words("", [value])[0][1:]
+
+    def block(self, motion, x=None, y=None, z=None, i=None, j=None, comment=None):
+        is_arc = i is not None
+        position = self.position
+        axis_words = []
+        for axis, (letter, value) in enumerate((("X", x), ("Y", y), ("Z", z))):
+            if value is None:
+                continue
+            text = self.number(value)
+            if text != position[axis] or (is_arc and axis < 2):
+                axis_words.append(letter + text)
+                position[axis] = text
+
+        if not axis_words:
+            # 没有移动, 整段省略
+            return None
+
+        words = []
+        if motion != self.motion:
+            words.append(COMPACT_MOTION_NAMES[motion])
+            self.motion = motion
+        words.extend(axis_words)
+
+        if is_arc:
+            words.append("I" + self.number(i))
+            words.append("J" + self.number(j))
+
+        return " ".join(words)
+
+    def blocks(self, motions, points, zs, offsets):
+        """
+        一次格式化一串 G01/G02/G03 段, 参数与 FixedFormatter.blocks 相同,
+        结果与逐段调用 block 相同, 省略的段为 None。
+        各轴的地址字整列生成, 与上一次给出的值向量化比较, 不变的换成空串,
+        最后每段的地址字直接拼接。
+        """
+        n = len(motions)
+        is_arc = ~np.isnan(offsets[:, 0])
+        columns = []
+        emit = np.zeros((n, 3), dtype=bool)
+
+        for axis, (letter, values) in enumerate(
+            zip("XYZ", (points[:, 0], points[:, 1], zs))
+        ):
+            given = ~np.isnan(values)
+            column = np.array(self.words(letter, values[given].tolist()), dtype=object)
+            # 该轴上一次给出的值, 第一段与格式化器记录的位置比较
+            state = self.position[axis]
+            first = None if state is None else f" {letter}{state}"
+            changed = column != np.concatenate([np.array([first], object), column[:-1]])
+            if axis < 2:
+                changed |= is_arc[given]
+            emit[given, axis] = changed
+            if len(column):
+                self.position[axis] = column[-1][2:]
+            columns.append((given, np.where(changed, column, "")))
+
+        for letter, values in zip("IJ", offsets.T):
+            words = self.words(letter, values[is_arc].tolist())
+            columns.append((is_arc, np.array(words, dtype=object)))
+
+        # 省略的段不改变模态的运动指令
+        moving = emit.any(axis=1)
+        shown = motions[moving]
+        previous = np.concatenate(
+            [[-1 if self.motion is None else self.motion], shown[:-1]]
+        )
+        new_motion = np.zeros(n, dtype=bool)
+        new_motion[moving] = shown != previous
+        if len(shown):
+            self.motion = int(shown[-1])
+
+        names = np.array([" " + COMPACT_MOTION_NAMES[m] for m in range(4)], object)
+        columns.insert(0, (new_motion, names[motions[new_motion]]))
+
+        # 各列只在给出的段上有地址字, 其余段为空串; 每段的地址字直接拼接, 去掉开头的空格
+        full = []
+        for given, words in columns:
+            if given.all():
+                full.append(words[moving].tolist())
+            else:
+                column = np.full(n, "", dtype=object)
+                column[given] = words
+                full.append(column[moving].tolist())
+        lines = np.full(n, None, dtype=object)
+        lines[moving] = list(map(str.lstrip, map("".join, zip(*full))))
+        return lines.tolist()
@@ -0,0 +1,165 @@
+import os
+
+import numpy as np
+
+from cutter.batch import load_geometry, recipe_params
+from cutter.gcode import GCode
+from cutter.geometry import Geometry
+
+# 每批检查的候选位置数, 找到可放置的位置后不再检查后面的批次
+CANDIDATE_CHUNK = 1024
+
+
+class Placement:
+    """一个零件在板材上的位置: 旋转 angle 度后, 外包框左下角放在 (x, y)"""
+
+    def __init__(self, part, angle, x, y, width, height) -> None:
+        self.part = part
+        self.angle = angle
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+
+def bottom_left_fill(sizes, sheet_width, sheet_height, spacing=0.0):
+    """
+    左下角填充排版。sizes[i] 是第 i 个零件各个旋转角度下的外包框
+    [(angle, width, height), ...]。零件按面积从大到小依次放置,
+    每个零件取所有旋转角度中最靠下、其次最靠左的可行位置。
+    返回 (placements, 放不下的零件序号)。
+    """
+    order = sorted(
+        range(len(sizes)),
+        key=lambda i: -min(w * h for _, w, h in sizes[i]),
+    )
+
+    placed = np.empty((0, 4))  # x0, y0, x1, y1
+    placements = []
+    unplaced = []
+
+    for i in order:
+        best = None
+        # 候选位置: 板材原点, 以及已放置零件的右边和上边
+        xs = np.unique(np.concatenate([[0.0], placed[:, 2] + spacing]))
+        ys = np.unique(np.concatenate([[0.0], placed[:, 3] + spacing]))
+        cy, cx = (a.ravel() for a in np.meshgrid(ys, xs, indexing="ij"))
+
+        for angle, width, height in sizes[i]:
+            fits = (cx + width <= sheet_width) & (cy + height <= sheet_height)
+            position = first_free_position(
+                cx[fits], cy[fits], width, height, placed, spacing
+            )
+            if position is None:
+                continue
+            if best is None or (position[1], position[0]) < (best[2], best[1]):
+                best = (angle, position[0], position[1], width, height)
+
+        if best is None:
+            unplaced.append(i)
+            continue
+
+        angle, x, y, width, height = best
+        placements.append(Placement(i, angle, x, y, width, height))
+        placed = np.vstack([placed, np.array([[x, y, x + width, y + height]])])
+
+    return (placements, unplaced)
+
+
+def first_free_position(xs, ys, width, height, placed, spacing):
+    # 候选位置已按 y、x 排序, 分批做向量化的重叠检查
+    order = np.lexsort((xs, ys))
+    xs = xs[order]
+    ys = ys[order]
+
+    for start in range(0, len(xs), CANDIDATE_CHUNK):
+        x = xs[start : start + CANDIDATE_CHUNK, None]
+        y = ys[start : start + CANDIDATE_CHUNK, None]
+        overlap = (
+            (x < placed[:, 2] + spacing)
+            & (placed[:, 0] < x + width + spacing)
+            & (y < placed[:, 3] + spacing)
+            & (placed[:, 1] < y + height + spacing)
+        )
+        free = np.flatnonzero(~overlap.any(axis=1))
+        if len(free) > 0:
+            k = start + free[0]
+            return (float(xs[k]), float(ys[k]))
+
+    return None
+
+
+def nest_geometries(
+    geometries,
+    quantities,
+    sheet_width,
+    sheet_height,
+    spacing=5.0,
+    angles=(0.0, 90.0, 180.0, 270.0),
+):
+    """
+    把每个 Geometry 按数量排到板材上, 合并成一个 Geometry。
+    返回 (合并后的 Geometry, placements, 放不下的零件序号),
+    placements 和放不下的零件序号都对应按数量展开后的零件列表。
+    """
+    rotated = []
+    for geometry in geometries:
+        if len(geometry) == 0:
+            raise Exception("没有可用的dxf实体!")
+        rotated.append({angle: geometry.rotate(angle) for angle in angles})
+
+    parts = []
+    sizes = []
+    for k, quantity in enumerate(quantities):
+        size = []
+        for angle, g in rotated[k].items():
+            width, height = (g.extmax - g.extmin).tolist()
+            size.append((angle, width, height))
+        parts.extend([k] * quantity)
+        sizes.extend([size] * quantity)
+
+    placements, unplaced = bottom_left_fill(sizes, sheet_width, sheet_height, spacing)
+    if not placements:
+        raise Exception("板材尺寸不足, 无法排版!")
+
+    placed = []
+    for p in placements:
+        g = rotated[parts[p.part]][p.angle]
+        placed.append(g.translate(p.x - g.extmin[0], p.y - g.extmin[1]))
+
+    return (Geometry.concatenate(placed), placements, unplaced)
+
+
+def load_recipe_geometry(recipe, dxf_dir):
+    return load_geometry(os.path.join(dxf_dir, f"{recipe._id}.dxf"))
+
+
+def nest_recipes(
+    recipes,
+    quantities,
+    sheet_width,
+    sheet_height,
+    dxf_dir,
+    spacing=5.0,
+    alignment=None,
+):
+    """
+    把多个配方的零件排到一张板材上, 返回 (GCode, placements, 放不下的零件序号)。
+    同一个程序只能用一把刀, 所有配方的刀具参数必须相同。
+    spacing 是相邻零件刀具轨迹之间的间隙, 零件外包框之间还要再留出两倍的补偿半径。
+    """
+    params = [recipe_params(r) for r in recipes]
+    if any(p != params[0] for p in params):
+        raise Exception("配方的刀具参数不一致, 无法排到同一个程序!")
+
+    params = params[0]
+    gap = spacing + 2 * abs(params["tool_radius"] - params["cutter_offset"])
+
+    geometries = [load_recipe_geometry(r, dxf_dir) for r in recipes]
+    geometry, placements, unplaced = nest_geometries(
+        geometries, quantities, sheet_width, sheet_height, gap
+    )
+
+    generator = GCode(geometry, alignment=alignment, **params)
+
+    return (generator, placements, unplaced)
@@ -0,0 +1,284 @@
+import math
+from typing import List
+from typing import Optional
+
+import numpy as np
+
+from cutter.geometry import ARC, LINE, Contour
+
+EPSILON = 1e-6
+
+# ((几何指纹, 拟合参数), 补偿半径) -> 偏置后的轮廓列表,
+# 使用同一把刀的配方之间切换时直接复用
+OFFSET_CACHE = {}
+OFFSET_CACHE_SIZE = 16
+
+
+class Element:
+    """偏置计算中的一段直线或圆弧, index 是它在原轮廓中的序号"""
+
+    def __init__(self, kind, start, end, center, ccw, index) -> None:
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.center = center
+        self.ccw = ccw
+        self.index = index
+
+    @property
+    def radius(self):
+        return math.hypot(
+            self.start[0] - self.center[0], self.start[1] - self.center[1]
+        )
+
+    def tangent(self, point):
+        if self.kind == LINE:
+            dx = self.end[0] - self.start[0]
+            dy = self.end[1] - self.start[1]
+        else:
+            dx = -(point[1] - self.center[1])
+            dy = point[0] - self.center[0]
+            if not self.ccw:
+                dx, dy = -dx, -dy
+
+        length = math.hypot(dx, dy)
+        return (dx / length, dy / length)
+
+    def sweep(self, start, end):
+        # 圆弧从 start 沿走刀方向转到 end 的角度, 范围 [0, 2pi)
+        a1 = math.atan2(start[1] - self.center[1], start[0] - self.center[0])
+        a2 = math.atan2(end[1] - self.center[1], end[0] - self.center[0])
+        delta = a2 - a1 if self.ccw else a1 - a2
+        return delta % (2 * math.pi)
+
+    def trimmed(self, start, end):
+        return Element(self.kind, start, end, self.center, self.ccw, self.index)
+
+    def is_valid_trim(self, start, end):
+        # 裁剪或延长后的几何必须与原走刀方向相同
+        if self.kind == LINE:
+            dx = self.end[0] - self.start[0]
+            dy = self.end[1] - self.start[1]
+            along = (end[0] - start[0]) * dx + (end[1] - start[1]) * dy
+            return along > EPSILON * math.hypot(dx, dy)
+
+        # 反向的圆弧转角会接近 2pi, 以原转角和 2pi 的中间值为界
+        full = self.sweep(self.start, self.end)
+        if full < EPSILON:
+            full = 2 * math.pi
+        trimmed = self.sweep(start, end)
+        return EPSILON < trimmed < (full + 2 * math.pi) / 2
+
+
+def offset_element(kind, start, end, center, ccw, distance, index):
+    # 向走刀方向右侧偏置 distance, 与 G42 一致; 内侧圆弧半径不足时返回 None
+    if kind == LINE:
+        dx = end[0] - start[0]
+        dy = end[1] - start[1]
+        length = math.hypot(dx, dy)
+        nx = dy / length * distance
+        ny = -dx / length * distance
+        return Element(
+            LINE,
+            (start[0] + nx, start[1] + ny),
+            (end[0] + nx, end[1] + ny),
+            None,
+            ccw,
+            index,
+        )
+
+    radius = math.hypot(start[0] - center[0], start[1] - center[1])
+    offset_radius = radius + distance if ccw else radius - distance
+    if offset_radius < EPSILON:
+        return None
+
+    scale = offset_radius / radius
+    return Element(
+        ARC,
+        (
+            center[0] + (start[0] - center[0]) * scale,
+            center[1] + (start[1] - center[1]) * scale,
+        ),
+        (
+            center[0] + (end[0] - center[0]) * scale,
+            center[1] + (end[1] - center[1]) * scale,
+        ),
+        center,
+        ccw,
+        index,
+    )
+
+
+def line_circle_intersections(p, d, center, radius):
+    fx = p[0] - center[0]
+    fy = p[1] - center[1]
+    a = d[0] * d[0] + d[1] * d[1]
+    b = 2 * (fx * d[0] + fy * d[1])
+    c = fx * fx + fy * fy - radius * radius
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        # 相切时数值误差可能使判别式略小于 0
+        if discriminant < -EPSILON * a:
+            return []
+        discriminant = 0.0
+
+    root = math.sqrt(discriminant)
+    return [
+        (p[0] + t * d[0], p[1] + t * d[1])
+        for t in ((-b - root) / (2 * a), (-b + root) / (2 * a))
+    ]
+
+
+def circle_circle_intersections(c1, r1, c2, r2):
+    dx = c2[0] - c1[0]
+    dy = c2[1] - c1[1]
+    distance = math.hypot(dx, dy)
+    if distance < EPSILON or distance > r1 + r2 + EPSILON:
+        return []
+    if distance < abs(r1 - r2) - EPSILON:
+        return []
+
+    a = (r1 * r1 - r2 * r2 + distance * distance) / (2 * distance)
+    h = math.sqrt(max(r1 * r1 - a * a, 0.0))
+    mx = c1[0] + a * dx / distance
+    my = c1[1] + a * dy / distance
+    return [
+        (mx + h * dy / distance, my - h * dx / distance),
+        (mx - h * dy / distance, my + h * dx / distance),
+    ]
+
+
+def intersections(e1, e2):
+    # 两段几何所在直线或整圆的交点
+    if e1.kind == LINE and e2.kind == LINE:
+        d1 = (e1.end[0] - e1.start[0], e1.end[1] - e1.start[1])
+        d2 = (e2.end[0] - e2.start[0], e2.end[1] - e2.start[1])
+        cross = d1[0] * d2[1] - d1[1] * d2[0]
+        if abs(cross) < EPSILON * math.hypot(*d1) * math.hypot(*d2):
+            return []
+        wx = e2.start[0] - e1.start[0]
+        wy = e2.start[1] - e1.start[1]
+        t = (wx * d2[1] - wy * d2[0]) / cross
+        return [(e1.start[0] + t * d1[0], e1.start[1] + t * d1[1])]
+
+    if e1.kind == LINE or e2.kind == LINE:
+        line, arc = (e1, e2) if e1.kind == LINE else (e2, e1)
+        d = (line.end[0] - line.start[0], line.end[1] - line.start[1])
+        return line_circle_intersections(line.start, d, arc.center, arc.radius)
+
+    return circle_circle_intersections(e1.center, e1.radius, e2.center, e2.radius)
+
+
+def join(e1, e2, vertex):
+    """
+    计算相邻两段偏置几何的连接方式, 返回 (e1 的新终点, e2 的新起点, 过渡圆弧)。
+    外角(左转)在原顶点处补一段半径为补偿值的圆弧, 内角(右转)裁剪到两段的交点。
+    """
+    p = e1.end
+    q = e2.start
+    if math.hypot(p[0] - q[0], p[1] - q[1]) < EPSILON:
+        return (p, p, None)
+
+    t1 = e1.tangent(p)
+    t2 = e2.tangent(q)
+    turn = t1[0] * t2[1] - t1[1] * t2[0]
+    # 原路折返时两段偏置平行, 也按外角处理, 补半圆
+    reverse = abs(turn) < EPSILON and t1[0] * t2[0] + t1[1] * t2[1] < 0
+
+    if vertex is not None and (turn > 0 or reverse):
+        return (p, q, Element(ARC, p, q, vertex, True, e1.index))
+
+    middle = ((p[0] + q[0]) / 2, (p[1] + q[1]) / 2)
+    points = intersections(e1, e2)
+    if not points:
+        return (p, q, Element(LINE, p, q, None, True, e1.index))
+
+    x = min(points, key=lambda x: math.hypot(x[0] - middle[0], x[1] - middle[1]))
+    return (x, x, None)
+
+
+def offset_contour(contour, distance):
+    """
+    把闭合轮廓向走刀方向右侧偏置 distance, 得到刀具中心的轨迹。
+    偏置后方向反转或半径不足的几何段会被删除, 再重新连接相邻的两段。
+    """
+    points = contour.points.tolist()
+    centers = contour.centers.tolist()
+    ccw = contour.ccw.tolist()
+    n = len(contour)
+
+    elements = []
+    for k, kind in enumerate(contour.kinds.tolist()):
+        e = offset_element(
+            kind, points[k], points[k + 1], centers[k], ccw[k], distance, k
+        )
+        if e is not None:
+            elements.append(e)
+
+    starts, ends = [], []
+    corners: List[Optional[Element]] = []
+    while elements:
+        starts = [e.start for e in elements]
+        ends = [e.end for e in elements]
+        corners = [None] * len(elements)
+
+        for k, e1 in enumerate(elements):
+            e2 = elements[(k + 1) % len(elements)]
+            # 只有原轮廓中直接相连的两段才在原顶点处补圆弧
+            vertex = None
+            if (e1.index + 1) % n == e2.index:
+                vertex = points[e2.index]
+            ends[k], starts[(k + 1) % len(elements)], corners[k] = join(e1, e2, vertex)
+
+        invalid = [
+            k for k, e in enumerate(elements) if not e.is_valid_trim(starts[k], ends[k])
+        ]
+        if not invalid:
+            break
+        if len(invalid) == len(elements):
+            elements = []
+            break
+
+        # 连续多段无效时只删除第一段, 其余的在重新连接后再判断
+        invalid = set(invalid)
+        elements = [
+            e
+            for k, e in enumerate(elements)
+            if k not in invalid or (k - 1) % len(elements) in invalid
+        ]
+
+    if not elements:
+        raise Exception("刀具半径过大, 无法计算补偿轮廓!")
+
+    path = []
+    for k, e in enumerate(elements):
+        path.append(e.trimmed(starts[k], ends[k]))
+        if corners[k] is not None:
+            path.append(corners[k])
+
+    kinds = np.array([e.kind for e in path], dtype=np.int8)
+    vertices = np.array([e.start for e in path] + [path[0].start], dtype=np.float64)
+    arc_centers = np.array(
+        [(0.0, 0.0) if e.center is None else e.center for e in path],
+        dtype=np.float64,
+    )
+
+    return Contour(kinds, vertices, arc_centers, np.array([e.ccw for e in path]))
+
+
+def offset_contours(contours, distance):
+    return [offset_contour(c, distance) for c in contours]
+
+
+def cached_offset_contours(key, build, distance):
+    """按 (key, distance) 缓存偏置结果, build 在缓存未命中时生成原始轮廓"""
+    cache_key = (key, distance)
+    contours = OFFSET_CACHE.pop(cache_key, None)
+    if contours is None:
+        contours = offset_contours(build(), distance)
+        while len(OFFSET_CACHE) >= OFFSET_CACHE_SIZE:
+            del OFFSET_CACHE[next(iter(OFFSET_CACHE))]
+
+    # 重新插入, 使字典顺序即最近使用顺序
+    OFFSET_CACHE[cache_key] = contours
+    return contours
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+
+# 生成规则变化时加一, 使旧的缓存程序全部失效
+PROGRAM_VERSION = 2
+# 计算缓存键时主轴位置取整到该间距(mm)的网格点, 下刀点仍按实际位置选择;
+# 读到的位置有微小变化或主轴只移动了一点时仍然命中缓存
+START_POSITION_GRID = 50.0
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def quantize_position(position, grid=START_POSITION_GRID):
+    """把主轴的 (x, y) 位置取整到 grid 的网格点上"""
+    return [round(float(v) / grid) * grid for v in position]
+
+
+def program_key(dxf_digest, params, alignment):
+    """由 dxf 内容摘要、刀具参数和对刀位置计算程序的缓存键"""
+    content = json.dumps(
+        [PROGRAM_VERSION, dxf_digest, params, alignment],
+        sort_keys=True,
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ProgramCache:
+    """
+    按内容寻址的 G 代码缓存, 每个程序保存为 <key>.nc。
+
+    命中时更新文件的修改时间, 总大小超过 max_size 时按修改时间
+    从旧到新删除, 即按大小限制的 LRU。
+    """
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_size = max_size
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.nc")
+
+    def get(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+
+        os.utime(path)
+        return path
+
+    def put(self, key, write):
+        """
+        调用 write(file) 生成程序并放入缓存, 返回缓存文件路径。
+        先写临时文件, 生成失败时不会留下半个程序。
+        """
+        path = self.path(key)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", buffering=1024 * 1024) as file:
+                write(file)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".nc"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
@@ -0,0 +1,59 @@
+import numpy as np
+
+from cutter.geometry import Contour, line_runs, point_segment_distance
+
+# 偏差小于该值的顶点视为共线, 即使不做简化也会合并
+COLLINEAR_TOLERANCE = 1e-6
+
+
+def douglas_peucker(points, tolerance):
+    """返回需要保留的顶点掩码, 首尾顶点总是保留"""
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = True
+    keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+
+        distances = point_segment_distance(points[a + 1 : b], points[a], points[b])
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            i += a + 1
+            keep[i] = True
+            stack.append((a, i))
+            stack.append((i, b))
+
+    return keep
+
+
+def simplify_contour(contour, tolerance=0.0):
+    """
+    合并共线的直线段, 并在弦高误差 tolerance 内用 Douglas-Peucker 简化连续直线段。
+    圆弧的端点和轮廓起点保持不变。返回 (新轮廓, 减少的程序段数)。
+    """
+    tolerance = max(tolerance, COLLINEAR_TOLERANCE)
+    keep = np.ones(len(contour) + 1, dtype=bool)
+
+    for start, end in line_runs(contour.kinds):
+        if end - start > 1:
+            keep[start : end + 1] = douglas_peucker(
+                contour.points[start : end + 1], tolerance
+            )
+
+    removed = len(keep) - int(keep.sum())
+    if removed == 0:
+        return (contour, 0)
+
+    # 保留顶点出发的那一段就是合并后的线段, 被删掉的顶点两侧都是直线
+    segments = np.flatnonzero(keep[:-1])
+    simplified = Contour(
+        contour.kinds[segments],
+        contour.points[keep],
+        contour.centers[segments],
+        contour.ccw[segments],
+    )
+
+    return (simplified, removed)
@@ -0,0 +1,279 @@
+import re
+import warnings
+
+import numpy as np
+
+from cutter.geometry import arc_sweeps, segment_bounds
+
+RAPID = 0
+LINEAR = 1
+CW = 2
+CCW = 3
+
+COMMENT = re.compile(rb"\([^)\n]*\)|;[^\n]*")
+# TwinCAT 的 #set ...# 等指令行, 不是运动指令
+DIRECTIVE = re.compile(rb"^[ \t]*#[^\n]*", re.MULTILINE)
+# 后面没有数值的字母, 例如 "G64 P" 中的 P
+BARE_LETTER = re.compile(rb"[A-Z](?! *[-+.\d])")
+# 地址字和数值以外的字符都替换成空格
+TOKEN_CHARS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.+-\n"
+CLEAN_TABLE = bytes(c if c in TOKEN_CHARS else ord(" ") for c in range(256))
+# 圆弧展开成折线时每段的最大数量
+MAX_ARC_PIECES = 1024
+
+
+class Toolpath:
+    """
+    G 代码解析出的运动段, 每个数组的第 k 行对应第 k 段。
+
+    motions 是 G00/G01/G02/G03 的编号, starts/ends 是起止点 (n, 3),
+    centers 是圆弧的圆心 (n, 2), 直线段为 nan; feeds 和 speeds 是当时的 F 和 S;
+    lines 是所在的行号(从 0 开始)。directives 是 [(行号, 文本), ...] 形式的 # 指令行。
+    assigned (n, 3) 表示每段终点的各轴是否已经由程序给出过; 没有给出过的轴,
+    以及第一段的起点, 都是假定的 0, 不是刀具真实的位置。
+    """
+
+    def __init__(
+        self,
+        motions,
+        starts,
+        ends,
+        centers,
+        feeds,
+        speeds,
+        lines,
+        directives=None,
+        assigned=None,
+    ) -> None:
+        self.motions = motions
+        self.starts = starts
+        self.ends = ends
+        self.centers = centers
+        self.feeds = feeds
+        self.speeds = speeds
+        self.lines = lines
+        self.directives = directives or []
+        if assigned is None:
+            assigned = np.ones(ends.shape, dtype=bool)
+        self.assigned = assigned
+
+    def __len__(self):
+        return len(self.motions)
+
+    @property
+    def is_arc(self):
+        return (self.motions == CW) | (self.motions == CCW)
+
+
+def forward_fill(values, initial):
+    # nan 取前面最近的非 nan 值, 开头的 nan 取 initial
+    values = np.concatenate([[initial], values])
+    index = np.where(np.isnan(values), 0, np.arange(len(values)))
+    np.maximum.accumulate(index, out=index)
+    return values[index][1:]
+
+
+def parse_toolpath(lines):
+    """
+    把 G 代码解析成 Toolpath。lines 可以是整段文本, 也可以是行的可迭代对象。
+    处理 G00/G01/G02/G03、G90/G91 的模态、X/Y/Z、I/J、F 和 S,
+    忽略括号和分号注释, # 开头的指令行保存在 directives 中。
+    整段文本用正则一次切分, 模态的延续用向量化的前向填充完成, 不逐行解释。
+    """
+    if isinstance(lines, str):
+        text = lines
+    else:
+        text = "\n".join(line.rstrip("\r\n") for line in lines)
+
+    letters, values, token_lines, directives = tokenize(text)
+    line_count = text.count("\n") + 1
+
+    def per_line(mask, fill=np.nan):
+        # 每行中该地址字的值, 同一行出现多次时取最后一个
+        result = np.full(line_count, fill)
+        result[token_lines[mask]] = values[mask]
+        return result
+
+    is_g = letters == ord("G")
+    motions = forward_fill(
+        per_line(is_g & np.isin(values, (RAPID, LINEAR, CW, CCW))), RAPID
+    )
+    modes = per_line(is_g & np.isin(values, (90, 91)))
+    absolute = forward_fill(modes, 90) == 90
+
+    positions = []
+    assigned = []
+    for letter in "XYZ":
+        value = per_line(letters == ord(letter))
+        positions.append(axis_positions(value, absolute))
+        assigned.append(np.logical_or.accumulate(~np.isnan(value)))
+    positions = np.column_stack(positions)
+    assigned = np.column_stack(assigned)
+
+    specified = np.zeros(line_count, dtype=bool)
+    specified[token_lines[np.isin(letters, tuple(b"XYZ"))]] = True
+    move_lines = np.flatnonzero(specified)
+
+    ends = positions[move_lines]
+    starts = np.vstack([np.zeros((1, 3)), ends[:-1]])
+    move_motions = motions[move_lines].astype(np.int8)
+
+    offsets = np.column_stack(
+        [per_line(letters == ord("I"), 0.0), per_line(letters == ord("J"), 0.0)]
+    )[move_lines]
+    is_arc = (move_motions == CW) | (move_motions == CCW)
+    centers = np.where(is_arc[:, None], starts[:, :2] + offsets, np.nan)
+
+    return Toolpath(
+        move_motions,
+        starts,
+        ends,
+        centers,
+        forward_fill(per_line(letters == ord("F")), 0.0)[move_lines],
+        forward_fill(per_line(letters == ord("S")), 0.0)[move_lines],
+        move_lines,
+        directives,
+        assigned[move_lines],
+    )
+
+
+def tokenize(text):
+    """
+    把整段文本切分成地址字, 返回 (字母的 ASCII 码, 数值, 所在行, directives)。
+    字母换成编号(A=1 ... Z=26), 换行换成 "0 0", 文本变成一串数字后由 numpy 一次解析,
+    避免为每个地址字创建 Python 对象。
+    """
+    data = text.upper().encode("ascii", "replace")
+
+    directives = []
+    matches = list(DIRECTIVE.finditer(data))
+    if matches:
+        text_lines = text.split("\n")
+        line = 0
+        position = 0
+        for match in matches:
+            line += data.count(b"\n", position, match.start())
+            position = match.start()
+            directives.append((line, text_lines[line].strip()))
+
+    data = DIRECTIVE.sub(b"", data)
+    data = COMMENT.sub(b"", data).translate(CLEAN_TABLE)
+    data = BARE_LETTER.sub(b"", data)
+    for code in range(26):
+        letter = bytes([ord("A") + code])
+        if letter in data:
+            data = data.replace(letter, b" %d " % (code + 1))
+    data = data.replace(b"\n", b" 0 0 ")
+
+    with warnings.catch_warnings():
+        # 遇到无法解析的内容时 numpy 只给出警告并丢弃后面的数据
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            numbers = np.fromstring(data, sep=" ")
+        except (DeprecationWarning, ValueError):
+            raise Exception("G代码格式错误, 无法解析!")
+    if len(numbers) % 2 != 0:
+        raise Exception("G代码格式错误, 无法解析!")
+    codes = numbers[0::2]
+    values = numbers[1::2]
+    if np.any((codes != np.round(codes)) | (codes < 0) | (codes > 26)):
+        raise Exception("G代码格式错误, 无法解析!")
+
+    is_newline = codes == 0
+    token_lines = np.cumsum(is_newline)[~is_newline]
+    letters = (codes[~is_newline] + (ord("A") - 1)).astype(np.uint8)
+    return (letters, values[~is_newline], token_lines, directives)
+
+
+def axis_positions(values, absolute):
+    """
+    每行执行后某个轴的位置。values 是每行给出的坐标(未给出为 nan),
+    绝对坐标行直接取值, 相对坐标行在上一个位置上累加。
+    """
+    given = ~np.isnan(values)
+    increments = np.where(given & ~absolute, values, 0.0)
+    cumulative = np.cumsum(increments)
+
+    # 最近一次绝对坐标所在的行, 之后的相对增量在它的基础上累加
+    anchors = np.where(given & absolute, np.arange(len(values)), -1)
+    np.maximum.accumulate(anchors, out=anchors)
+    has_anchor = anchors >= 0
+    base = np.where(has_anchor, values[anchors], 0.0)
+    before = np.where(has_anchor, cumulative[anchors], 0.0)
+    return base + cumulative - before
+
+
+def parse_toolpath_file(path):
+    with open(path) as file:
+        return parse_toolpath(file.read())
+
+
+def move_bounds(toolpath):
+    """
+    每个运动段的外包框, 返回 (mins (n, 3), maxs (n, 3))。
+    圆弧包括经过的象限点, Z 在起止点之间线性变化(螺旋线), 取两端的范围。
+    程序还没有给出过的坐标(第一段的起点、之前没有出现过的轴)不计入,
+    两端都没有给出时为 nan。
+    """
+    ends = np.where(toolpath.assigned, toolpath.ends, np.nan)
+    starts = np.vstack([np.full((min(len(ends), 1), 3), np.nan), ends[:-1]])
+    mins = np.fmin(starts, ends)
+    maxs = np.fmax(starts, ends)
+
+    is_arc = toolpath.is_arc
+    if is_arc.any():
+        # 起点未知的圆弧得到 nan, 只保留终点的范围
+        arc_mins, arc_maxs = segment_bounds(
+            np.ones(int(is_arc.sum()), dtype=bool),
+            starts[is_arc, :2],
+            ends[is_arc, :2],
+            toolpath.centers[is_arc],
+            toolpath.motions[is_arc] == CCW,
+        )
+        mins[is_arc, :2] = np.fmin(mins[is_arc, :2], arc_mins)
+        maxs[is_arc, :2] = np.fmax(maxs[is_arc, :2], arc_maxs)
+    return (mins, maxs)
+
+
+def backplot(toolpath, tolerance=0.01):
+    """
+    把 Toolpath 展开成连续的折线, 圆弧按弦高误差 tolerance 细分, 用于预览和与 dxf 对比。
+    返回 (points (m+1, 3), moves (m,)), moves[k] 是第 k 段折线所属的运动段。
+    """
+    n = len(toolpath)
+    if n == 0:
+        return (np.zeros((0, 3)), np.zeros(0, dtype=np.int64))
+
+    starts = toolpath.starts
+    ends = toolpath.ends
+    is_arc = toolpath.is_arc
+    counts = np.ones(n, dtype=np.int64)
+    radii = np.zeros(n)
+    angles = np.zeros(n)
+    sweeps = np.zeros(n)
+
+    if is_arc.any():
+        r, a1, s = arc_sweeps(
+            starts[is_arc, :2],
+            ends[is_arc, :2],
+            toolpath.centers[is_arc],
+            toolpath.motions[is_arc] == CCW,
+        )
+        step = 2 * np.arccos(np.clip(1 - tolerance / np.maximum(r, tolerance), -1, 1))
+        counts[is_arc] = np.clip(np.ceil(np.abs(s) / step), 1, MAX_ARC_PIECES)
+        radii[is_arc] = r
+        angles[is_arc] = a1
+        sweeps[is_arc] = s
+
+    moves = np.repeat(np.arange(n), counts)
+    first = np.cumsum(counts) - counts
+    t = (np.arange(len(moves)) - first[moves] + 1) / counts[moves]
+
+    points = starts[moves] + (ends[moves] - starts[moves]) * t[:, None]
+    on_arc = is_arc[moves]
+    angle = angles[moves][on_arc] + sweeps[moves][on_arc] * t[on_arc]
+    centers = toolpath.centers[moves][on_arc]
+    points[on_arc, 0] = centers[:, 0] + radii[moves][on_arc] * np.cos(angle)
+    points[on_arc, 1] = centers[:, 1] + radii[moves][on_arc] * np.sin(angle)
+
+    return (np.vstack([starts[:1], points]), moves)
@@ -0,0 +1,215 @@
+import math
+
+import numpy as np
+
+# 2-opt 中与第 i 个点比较的最多点数, 限制大图纸上每遍的计算量
+TWO_OPT_WINDOW = 500
+# 所有遍数合计最多检查的起点 i 的个数, 点多时减少遍数, 保证耗时有上限且结果确定
+TWO_OPT_BUDGET = 20000
+
+
+def distance(p1, p2):
+    return math.hypot(p1[0] - p2[0], p1[1] - p2[1])
+
+
+class PointGrid:
+    """
+    剩余点的哈希网格, 格子边长使平均每格约一个点。
+    从查询点所在格子向外逐圈查找, 已找到的最近点比下一圈可能的距离还近时停止。
+    """
+
+    def __init__(self, points, indices) -> None:
+        xs = [points[i][0] for i in indices]
+        ys = [points[i][1] for i in indices]
+        self.x0 = min(xs)
+        self.y0 = min(ys)
+        width = max(max(xs) - self.x0, max(ys) - self.y0)
+        self.size = width / math.sqrt(len(indices)) if width > 0 else 1.0
+        self.extent = int(width / self.size) + 1
+        self.points = points
+        self.count = len(indices)
+        self.cells = {}
+        # indices 按升序加入, 每个格子里的序号也是升序
+        for i in indices:
+            self.cells.setdefault(self.cell_key(*points[i]), []).append(i)
+
+    def cell_key(self, x, y):
+        return (
+            math.floor((x - self.x0) / self.size),
+            math.floor((y - self.y0) / self.size),
+        )
+
+    def remove(self, i):
+        key = self.cell_key(*self.points[i])
+        self.cells[key].remove(i)
+        if not self.cells[key]:
+            del self.cells[key]
+        self.count -= 1
+
+    def remaining(self):
+        return sorted(i for indices in self.cells.values() for i in indices)
+
+    def nearest(self, point):
+        # 距离相同时取序号小的点
+        kx, ky = self.cell_key(point[0], point[1])
+        extent = self.extent
+        last = max(abs(kx), abs(ky), abs(kx - extent), abs(ky - extent))
+        # 查询点在网格外时, 从第一个与网格相交的圈开始
+        r = max(0, -kx, kx - extent, -ky, ky - extent)
+        best = None
+        while r <= last:
+            for key in ring_keys(kx, ky, r, extent):
+                for i in self.cells.get(key, ()):
+                    candidate = (distance(point, self.points[i]), i)
+                    if best is None or candidate < best:
+                        best = candidate
+            # 第 r + 1 圈以外的点距离至少为 r 个格子
+            if best is not None and best[0] < r * self.size:
+                break
+            r += 1
+        if best is None:
+            raise Exception("网格中没有剩余的点!")
+        return best[1]
+
+
+def ring_keys(kx, ky, r, extent):
+    # 以 (kx, ky) 为中心第 r 圈的格子, 只保留 [0, extent] 范围内的
+    if r == 0:
+        return [(kx, ky)]
+    x1, x2 = max(kx - r, 0), min(kx + r, extent)
+    y1, y2 = max(ky - r + 1, 0), min(ky + r - 1, extent)
+    keys = []
+    for y in (ky - r, ky + r):
+        if 0 <= y <= extent:
+            keys.extend((x, y) for x in range(x1, x2 + 1))
+    for x in (kx - r, kx + r):
+        if 0 <= x <= extent:
+            keys.extend((x, y) for y in range(y1, y2 + 1))
+    return keys
+
+
+def nearest_neighbour_tour(points, origin=(0.0, 0.0)):
+    # 剩余的点少于建网格时的一半后重建网格, 保持每格约一个点, 每一步只检查少量格子
+    tour = []
+    if len(points) == 0:
+        return tour
+
+    grid = PointGrid(points, range(len(points)))
+    built = grid.count
+    current = origin
+
+    while grid.count > 0:
+        if grid.count * 2 < built:
+            grid = PointGrid(points, grid.remaining())
+            built = grid.count
+        nearest = grid.nearest(current)
+        grid.remove(nearest)
+        tour.append(nearest)
+        current = points[nearest]
+
+    return tour
+
+
+def two_opt(points, tour, origin=(0.0, 0.0), max_passes=20, window=TWO_OPT_WINDOW):
+    """
+    2-opt 改进: 把 tour[i..j] 反转能缩短路线时就反转。
+    对每个 i, 所有 j 的增量用 numpy 一次算出, 取第一个能缩短的 j,
+    反转后从下一个 j 继续, 与逐个比较的结果相同。
+    j 只在 i 之后 window 个位置内查找, 每遍的计算量为 O(n * window);
+    遍数不超过 max_passes, 也不超过 TWO_OPT_BUDGET / n (至少一遍)。
+    """
+    # 路径从 origin 出发, 终点不回到 origin, 所以最后一段边的长度为 0
+    tour = list(tour)
+    n = len(tour)
+    if n < 2:
+        return tour
+
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    # path[k + 1] 是 tour[k] 的点, path[0] 是 origin
+    path = np.vstack([np.asarray(origin, dtype=np.float64), coords[tour]])
+    order = np.array(tour)
+
+    def length(p1, p2):
+        return np.hypot(p1[..., 0] - p2[..., 0], p1[..., 1] - p2[..., 1])
+
+    for _ in range(min(max_passes, max(1, TWO_OPT_BUDGET // n))):
+        improved = False
+        for i in range(n - 1):
+            j = i + 1
+            last = min(n, i + 1 + window)
+            while j < last:
+                a, b = path[i], path[i + 1]
+                js = np.arange(j, last)
+                c = path[js + 1]
+                # j 为最后一个点时后面没有边
+                has_next = js + 2 <= n
+                d = path[np.minimum(js + 2, n)]
+                delta = (
+                    length(a, c)
+                    + np.where(has_next, length(b, d), 0.0)
+                    - length(a, b)
+                    - np.where(has_next, length(c, d), 0.0)
+                )
+                better = np.flatnonzero(delta < -1e-9)
+                if len(better) == 0:
+                    break
+
+                k = int(js[better[0]])
+                order[i : k + 1] = order[i : k + 1][::-1].copy()
+                path[i + 1 : k + 2] = path[i + 1 : k + 2][::-1].copy()
+                improved = True
+                j = k + 1
+
+        if not improved:
+            break
+
+    return order.tolist()
+
+
+def travel_length(points, tour, origin=(0.0, 0.0)):
+    length = 0.0
+    current = origin
+    for i in tour:
+        length += distance(current, points[i])
+        current = points[i]
+
+    return length
+
+
+def plan_travel_order(points, origin=(0.0, 0.0)):
+    """按空行程(G00)最短安排轮廓顺序: 最近邻构造初始路线, 再用 2-opt 改进"""
+    tour = nearest_neighbour_tour(points, origin)
+    return two_opt(points, tour, origin)
+
+
+class VertexIndex:
+    """
+    各轮廓的顶点 (m, 2) 拼成一个数组, 只在建立时拼接一次,
+    之后按轮廓取数组的切片查询离某点最近的顶点, 不再为每次查询重新拼接。
+    距离相同时取序号小的顶点。
+    """
+
+    def __init__(self, vertex_arrays) -> None:
+        self.counts = np.array([len(v) for v in vertex_arrays])
+        self.offsets = np.cumsum(self.counts) - self.counts
+        self.vertices = np.vstack(vertex_arrays)
+
+    def nearest_all(self, point):
+        """每个轮廓中离 point 最近的顶点序号, 所有顶点一次算出距离后按轮廓分段取最小值"""
+        counts, offsets, vertices = self.counts, self.offsets, self.vertices
+        distances = np.hypot(vertices[:, 0] - point[0], vertices[:, 1] - point[1])
+
+        minimums = np.minimum.reduceat(distances, offsets)
+        # 每组中第一个等于最小值的顶点
+        hits = np.flatnonzero(distances == np.repeat(minimums, counts))
+        groups = np.searchsorted(offsets, hits, side="right") - 1
+        first = np.full(len(counts), -1)
+        first[groups[::-1]] = hits[::-1]
+        return (first - offsets).tolist()
+
+    def nearest(self, group, point):
+        """第 group 个轮廓中离 point 最近的顶点序号"""
+        start = self.offsets[group]
+        vertices = self.vertices[start : start + self.counts[group]]
+        distances = np.hypot(vertices[:, 0] - point[0], vertices[:, 1] - point[1])
+        return int(np.argmin(distances))
@@ -0,0 +1,137 @@
+import numpy as np
+
+from cutter.consts import MACHINE_TRAVEL
+from cutter.toolpath import CCW, CW, RAPID, backplot, move_bounds, parse_toolpath
+
+# 圆弧起点和终点到圆心的距离之差的允许值(mm), 程序坐标只保留 3 位小数
+ARC_RADIUS_TOLERANCE = 0.005
+# 短于该长度的移动视为零长度(mm)
+ZERO_LENGTH = 1e-6
+# 判断轮廓回到已经过的点时的坐标精度(mm)
+POINT_TOLERANCE = 0.001
+# 报错信息中最多列出的问题数
+MAX_REPORTED = 5
+
+
+def validate_toolpath(toolpath, travel=None):
+    """
+    对整个程序做向量化检查, 返回 [(行号, 问题), ...], 按行号排序。
+    检查圆弧起止点到圆心的距离是否一致(NC 报 19319)、零长度移动、
+    超出机床行程(NC 报 19376, 包括圆弧经过的象限点, 没有配置行程的轴不检查),
+    以及切割路径没有回到走过的点(轮廓不封闭)。
+    """
+    if travel is None:
+        travel = MACHINE_TRAVEL
+
+    starts = toolpath.starts
+    ends = toolpath.ends
+    problems = []
+
+    def report(mask, message):
+        for line in toolpath.lines[mask].tolist():
+            problems.append((line, message))
+
+    is_arc = (toolpath.motions == CW) | (toolpath.motions == CCW)
+    start_radii = np.hypot(*(starts[:, :2] - toolpath.centers).T)
+    end_radii = np.hypot(*(ends[:, :2] - toolpath.centers).T)
+    with np.errstate(invalid="ignore"):
+        report(
+            is_arc & (np.abs(start_radii - end_radii) > ARC_RADIUS_TOLERANCE),
+            "圆弧起点和终点到圆心的距离不一致",
+        )
+        report(is_arc & (start_radii < ZERO_LENGTH), "圆弧半径为零")
+
+    lengths = np.linalg.norm(ends - starts, axis=1)
+    report(~is_arc & (lengths < ZERO_LENGTH), "零长度移动")
+
+    # 圆弧中间经过的象限点也要在行程以内
+    mins, maxs = move_bounds(toolpath)
+    for axis, limits in travel.items():
+        if limits is None:
+            continue
+        low, high = limits
+        k = "xyz".index(axis)
+        report(
+            (mins[:, k] < low) | (maxs[:, k] > high), f"{axis.upper()} 轴超出机床行程"
+        )
+
+    report(unclosed_cuts(toolpath), "切割路径不封闭")
+
+    problems.sort()
+    return problems
+
+
+def unclosed_cuts(toolpath):
+    """
+    相邻两次快速定位之间的切割移动为一组, 每组最后一段的终点必须是本组走过的点
+    (包括开始切割的点), 或者落在更早切过的路径上(共边切割拆出的路径),
+    否则轮廓没有闭合。只移动 Z 的段不参与判断。
+    返回每一段是否为不封闭组的最后一段。
+    """
+    is_cut = toolpath.motions != RAPID
+    moves_xy = np.any(toolpath.ends[:, :2] != toolpath.starts[:, :2], axis=1)
+    groups = np.cumsum(~is_cut)
+
+    indices = np.flatnonzero(is_cut & moves_xy)
+    result = np.zeros(len(toolpath), dtype=bool)
+    if len(indices) == 0:
+        return result
+
+    group = groups[indices]
+    is_first = np.insert(group[1:] != group[:-1], 0, True)
+    is_last = np.append(group[1:] != group[:-1], True)
+
+    # 走过的点: 每段的终点, 以及每组第一段的起点
+    points = np.vstack(
+        [toolpath.ends[indices, :2], toolpath.starts[indices[is_first], :2]]
+    )
+    group = np.concatenate([group, group[is_first]])
+    grid = np.round(points / POINT_TOLERANCE).astype(np.int64)
+    keys = np.column_stack([group, grid])
+
+    # 排序后相邻的相同键就是同一组中重复经过的点
+    order = np.lexsort((grid[:, 1], grid[:, 0], group))
+    same = np.all(keys[order][1:] == keys[order][:-1], axis=1)
+    repeated = np.zeros(len(keys), dtype=bool)
+    repeated[order] = np.append(same, False) | np.insert(same, 0, False)
+
+    candidates = indices[is_last & ~repeated[: len(indices)]]
+    if len(candidates) > 0:
+        candidates = candidates[~on_earlier_cuts(toolpath, candidates, groups)]
+    result[candidates] = True
+    return result
+
+
+def on_earlier_cuts(toolpath, candidates, groups):
+    # 候选段的终点到更早分组中切割折线的距离是否在容差以内, 候选通常很少, 逐个计算
+    is_cut = toolpath.motions != RAPID
+    points, moves = backplot(toolpath, POINT_TOLERANCE)
+    keep = is_cut[moves]
+    starts = points[:-1][keep, :2]
+    deltas = points[1:][keep, :2] - starts
+    segment_groups = groups[moves[keep]]
+    squared = np.maximum(np.sum(deltas**2, axis=1), ZERO_LENGTH**2)
+
+    result = np.zeros(len(candidates), dtype=bool)
+    for n, index in enumerate(candidates.tolist()):
+        earlier = segment_groups < groups[index]
+        if not earlier.any():
+            continue
+        point = toolpath.ends[index, :2]
+        offsets = point - starts[earlier]
+        t = np.clip(np.sum(offsets * deltas[earlier], axis=1) / squared[earlier], 0, 1)
+        distances = np.hypot(*(offsets - deltas[earlier] * t[:, None]).T)
+        result[n] = distances.min() < POINT_TOLERANCE
+    return result
+
+
+def validate_program(lines, travel=None):
+    # 有问题时抛出异常, 列出前几个问题的行号
+    problems = validate_toolpath(parse_toolpath(lines), travel)
+    if not problems:
+        return
+
+    details = "; ".join(
+        f"第{line + 1}行 {message}" for line, message in problems[:MAX_REPORTED]
+    )
+    raise Exception(f"程序校验失败, 共{len(problems)}处问题: {details}!")
@@ -6,7 +6,7 @@ from qtpy.QtGui import QFont
 from qtpy.QtWidgets import QApplication, QDialog
 
 import cutter.consts as g
-from cutter.database import init_db
+from cutter.database import init_db, load_machine_travel
 from cutter.login import LoginDialog
 from cutter.main_window import MainWindow
 from cutter.plc import init_plc_conn
@@ -43,6 +43,7 @@ if __name__ == "__main__":
     # app.exec_()
 
     init_db()
+    load_machine_travel()
     init_plc_conn()
     axis_timer.start()
 
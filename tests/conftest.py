@@ -0,0 +1,65 @@
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+# 源码在 src 目录下, 没有安装成包, 测试时直接加入搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import ezdxf  # noqa: E402
+
+from cutter.consts import SUPPORTED_ENTITY_TYPES  # noqa: E402
+from cutter.geometry import Geometry  # noqa: E402
+
+
+@pytest.fixture
+def alignment():
+    # 对刀位置, 每个测试一份, 生成器修改它不影响其他测试
+    return {"x": 10.0, "y": 10.0, "z": 5.0}
+
+
+@pytest.fixture
+def tool_radius():
+    return 3
+
+
+@pytest.fixture
+def polylines_geometry():
+    """由多段线顶点列表 [[(x, y), ...], ...] 生成 Geometry 的函数"""
+
+    def build(polylines, closed=True):
+        doc = ezdxf.new()
+        msp = doc.modelspace()
+        for points in polylines:
+            msp.add_lwpolyline(points, close=closed)
+        return Geometry.from_entities(msp.query(" ".join(SUPPORTED_ENTITY_TYPES)))
+
+    return build
+
+
+@pytest.fixture
+def rectangles_geometry(polylines_geometry):
+    """由矩形 [(x, y, 宽, 高), ...] 生成 Geometry 的函数"""
+
+    def build(rectangles):
+        return polylines_geometry(
+            [
+                [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+                for x, y, w, h in rectangles
+            ]
+        )
+
+    return build
+
+
+@pytest.fixture
+def generate():
+    """生成程序并返回程序文本的函数, 不打印生成过程中的调试信息"""
+
+    def run(generator):
+        with redirect_stdout(io.StringIO()):
+            return generator.generate()
+
+    return run
@@ -0,0 +1,47 @@
+import re
+
+from cutter.batch import generate_parts
+from cutter.geometry import Geometry
+
+
+def test_parts_move_to_first_contour_at_safe_height(
+    rectangles_geometry, tool_radius, alignment
+):
+    # 后面的零件开始时前面的零件已经切完, 水平移动必须在安全高度, 不能斜着下降
+    geometries = [rectangles_geometry([(100 * k, 0, 60, 40)]) for k in range(3)]
+    params = {
+        "tool_radius": tool_radius,
+        "cutter_offset": 0,
+        "rotation_speed": 1000,
+        "cutter_deepth": 3,
+        "link_clearance": 2,
+    }
+    program = generate_parts(geometries, params, alignment, max_workers=2)
+
+    safe_height = alignment["z"] + 10
+    z = None
+    rapids = 0
+    for line in program.split("\n"):
+        words = dict(re.findall(r"([XYZ])(-?[\d.]+)", line))
+        if line.startswith("G00") and "X" in words:
+            assert "Z" not in words
+            assert z == safe_height
+            rapids += 1
+        if "Z" in words:
+            z = float(words["Z"])
+    assert rapids >= len(geometries)
+
+
+def test_empty_parts_are_skipped(rectangles_geometry, tool_radius, alignment):
+    # 空零件没有外包框, 生成的程序与不包含它时相同
+    geometry = rectangles_geometry([(0, 0, 60, 40)])
+    params = {
+        "tool_radius": tool_radius,
+        "cutter_offset": 0,
+        "rotation_speed": 1000,
+        "cutter_deepth": 3,
+    }
+    expected = generate_parts([geometry], params, alignment, max_workers=1)
+    empty = Geometry.from_entities([])
+    program = generate_parts([empty, geometry], params, alignment, max_workers=1)
+    assert program == expected
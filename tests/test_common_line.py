@@ -0,0 +1,105 @@
+import numpy as np
+
+from cutter.common_line import find_shared_edges, split_shared_edges
+from cutter.feed import plan_feeds
+from cutter.gcode import GCode
+from cutter.geometry import LINE, Contour
+
+
+def lines_contour(points):
+    # 由顶点依次连成的闭合直线轮廓
+    points = np.array(points + points[:1], dtype=np.float64)
+    n = len(points) - 1
+    return Contour(
+        np.full(n, LINE, dtype=np.int8), points, np.zeros((n, 2)), np.zeros(n, bool)
+    )
+
+
+def square(x, y, w, h):
+    return lines_contour([(x, y), (x + w, y), (x + w, y + h), (x, y + h)])
+
+
+def distance_to_path(point, points):
+    starts, ends = points[:-1], points[1:]
+    d = ends - starts
+    t = np.clip(((point - starts) * d).sum(axis=1) / (d * d).sum(axis=1), 0, 1)
+    return np.hypot(*(starts + t[:, None] * d - point).T).min()
+
+
+def test_shared_edge_is_recorded_on_later_contour():
+    # 右边的矩形左边与左边矩形右边的中段重合, 方向相反
+    first = square(0, 0, 10, 10)
+    second = square(10, 2, 10, 5)
+
+    shared = find_shared_edges([first, second])
+    assert len(shared) == 1
+    edge = shared[0]
+    assert (edge.contour, edge.segment, edge.other) == (1, 3, 0)
+    assert np.allclose((edge.t0, edge.t1), (0, 1))
+
+    # 切割顺序反过来时记在大矩形右边的 [0.2, 0.7] 部分
+    edge = find_shared_edges([second, first])[0]
+    assert (edge.contour, edge.segment, edge.other) == (1, 1, 0)
+    assert np.allclose((edge.t0, edge.t1), (0.2, 0.7))
+
+
+def test_parallel_edges_apart_are_not_shared():
+    assert find_shared_edges([square(0, 0, 10, 10), square(10.01, 0, 10, 10)]) == []
+
+
+def test_split_removes_shared_edge():
+    first = square(0, 0, 10, 10)
+    second = square(10, 2, 10, 5)
+    contours = [first, second]
+
+    paths, sources, approaches, length = split_shared_edges(
+        contours, find_shared_edges(contours)
+    )
+
+    assert length == 5
+    assert sources == [0, 1]
+    # 先切的轮廓不变, 后切的轮廓去掉重合的左边, 剩下三条边连成一条路径
+    assert paths[0] is first and approaches[0] is None
+    assert not paths[1].is_closed()
+    assert np.allclose(paths[1].points, [(10, 2), (20, 2), (20, 7), (10, 7)])
+    # 下刀点在已切开的重合边上
+    x, y = approaches[1]
+    assert x == 10 and 2 <= y <= 7
+
+
+def test_open_paths_lead_in_along_cut_kerf(
+    rectangles_geometry, tool_radius, alignment, generate
+):
+    # 间距正好是两倍刀具半径, 补偿后的轮廓两两共边
+    gap = 2 * tool_radius
+    geometry = rectangles_geometry(
+        [(0, 0, 100, 50), (100 + gap, 0, 100, 50), (0, 50 + gap, 200 + gap, 40)]
+    )
+    generator = GCode(
+        geometry,
+        tool_radius,
+        0,
+        1000,
+        3,
+        alignment=alignment,
+        software_compensation=True,
+        common_line=True,
+    )
+    generate(generator)
+
+    assert generator.shared_length > 0
+    opened = [k for k, c in enumerate(generator.contours) if not c.is_closed()]
+    assert opened
+
+    for k in opened:
+        # 下刀点落在先切轮廓的切缝上, 不会切进相邻零件
+        lead_in = np.asarray(generator.lead_ins[k])
+        cut = [c.points for c in generator.contours[:k]]
+        assert min(distance_to_path(lead_in, points) for points in cut) < 1e-6
+
+        # 开放路径两端没有拐角, 从静止加速、减速到静止, 不快于按闭合轮廓规划的速度
+        path = generator.contours[k]
+        opened_feeds = plan_feeds(path, 100, 100000, closed=False)
+        closed_feeds = plan_feeds(path, 100, 100000)
+        assert opened_feeds[0] < 100000 and opened_feeds[-1] < 100000
+        assert all(a <= b for a, b in zip(opened_feeds, closed_feeds))
@@ -0,0 +1,35 @@
+import numpy as np
+
+from cutter.containment import BoxIndex, containment_parents
+
+
+def circle(cx, cy, r, count=16):
+    angles = np.linspace(0, 2 * np.pi, count, endpoint=False)
+    return np.column_stack([cx + r * np.cos(angles), cy + r * np.sin(angles)])
+
+
+def test_sheet_outline_with_small_holes():
+    # 整张板的外轮廓远大于孔, 不登记到格子里, 每个孔仍找到它
+    outline = np.array([[0, 0], [2500, 0], [2500, 1250], [0, 1250]], dtype=float)
+    rng = np.random.default_rng(1)
+    centers = rng.uniform(10, 1240, (300, 2)) * [2, 1]
+    polygons = [outline] + [circle(x, y, 0.3)[::-1] for x, y in centers]
+
+    boxes = np.array([(*p.min(axis=0), *p.max(axis=0)) for p in polygons])
+    assert BoxIndex(boxes).large == [0]
+    assert containment_parents(polygons) == [-1] + [0] * len(centers)
+
+
+def test_overlapping_boxes_match_full_scan():
+    # 小范围查格子, 大范围直接比较, 结果都与逐个比较相同
+    rng = np.random.default_rng(2)
+    corners = rng.uniform(0, 1000, (500, 2))
+    sizes = rng.uniform(1, 40, (500, 2))
+    boxes = np.vstack([np.hstack([corners, corners + sizes]), [[0, 0, 1050, 1050]]])
+    index = BoxIndex(boxes)
+    for low, size in zip(rng.uniform(-50, 1000, (50, 2)), [5, 30, 200, 800] * 13):
+        high = low + size
+        expected = np.flatnonzero(
+            np.all(boxes[:, :2] <= high, axis=1) & np.all(boxes[:, 2:] >= low, axis=1)
+        )
+        assert index.overlapping(low, high) == expected.tolist()
@@ -0,0 +1,101 @@
+import math
+
+import ezdxf
+import numpy as np
+
+from cutter.gcode import GCode
+from cutter.geometry import ARC, Geometry
+from cutter.heal import HEAL_TOLERANCE, heal_gaps
+
+
+def lines_geometry(points):
+    # 每条边是单独的 LINE, 端点之间才会有缝隙
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    for k in range(len(points)):
+        msp.add_line(points[k], points[(k + 1) % len(points)])
+    return Geometry.from_entities(msp.query("LINE"))
+
+
+def tessellated_circle(radius, count):
+    angles = np.linspace(0, 2 * math.pi, count, endpoint=False)
+    return [(radius * math.cos(a), radius * math.sin(a)) for a in angles]
+
+
+def test_tessellated_curve_is_not_collapsed(alignment, generate):
+    # 2000 段 0.031mm 的直线, 比容差还短, 端点都已连上, 不应被合并
+    geometry = lines_geometry(tessellated_circle(10.0, 2000))
+    healed, gaps = heal_gaps(geometry, HEAL_TOLERANCE)
+
+    assert gaps == []
+    assert len(healed) == len(geometry)
+    assert np.array_equal(healed.starts, geometry.starts)
+
+    generator = GCode(
+        geometry, 3, 0.5, 1000, 2, alignment=alignment, heal_tolerance=0.05
+    )
+    program = generate(generator)
+    assert len(generator.contours) == 1
+    # 切入起点的一段加上 2000 段轮廓
+    assert program.count("G01 X") == 2001
+
+
+def test_small_gaps_are_healed():
+    geometry = lines_geometry([(0, 0), (100, 0), (100, 50), (0, 50)])
+    starts = geometry.starts.copy()
+    starts[1] += (0.02, 0.01)
+    geometry = Geometry(
+        geometry.kinds,
+        starts,
+        geometry.ends,
+        geometry.centers,
+        geometry.radii,
+        geometry.start_angles,
+        geometry.end_angles,
+        geometry.handles,
+        geometry.extmin,
+        geometry.extmax,
+    )
+
+    healed, gaps = heal_gaps(geometry, HEAL_TOLERANCE)
+
+    assert len(gaps) == 1
+    assert gaps[0].count == 2
+    assert gaps[0].distance < HEAL_TOLERANCE
+    assert np.allclose(healed.starts[1], healed.ends[0])
+
+
+def test_wide_cluster_is_not_merged(polylines_geometry):
+    # 一串 0.01mm 的短线, 间隔 0.03mm, 两两都在容差内, 但连起来有 0.4mm 宽
+    lines = [[(k * 0.04, 0), (k * 0.04 + 0.01, 0)] for k in range(10)]
+    geometry = polylines_geometry(lines, closed=False)
+
+    healed, gaps = heal_gaps(geometry, HEAL_TOLERANCE)
+
+    assert gaps == []
+    assert len(healed) == len(geometry)
+
+
+def test_moved_arc_end_keeps_radius():
+    # 弓形: 圆弧的终点与弦的起点差 0.03mm, 合并后圆弧半径不变, 圆心重新计算
+    start = (10 * math.cos(math.radians(30)), 5.0)
+    end = (-start[0], 5.0)
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_arc((0, 0), 10, 30, 150)
+    msp.add_line((end[0] + 0.03, end[1]), start)
+    geometry = Geometry.from_entities(msp.query("LINE ARC"))
+
+    healed, gaps = heal_gaps(geometry, HEAL_TOLERANCE)
+
+    assert len(gaps) == 1 and gaps[0].count == 2
+    arc = int(np.flatnonzero(healed.kinds == ARC)[0])
+    line = 1 - arc
+    assert np.allclose(healed.ends[arc], (end[0] + 0.015, end[1]))
+    assert np.allclose(healed.starts[line], healed.ends[arc])
+    # 没有移动的起点保持不变, 两端到新圆心的距离都等于原半径
+    assert np.array_equal(healed.starts[arc], geometry.starts[arc])
+    assert healed.radii[arc] == 10
+    for point in (healed.starts[arc], healed.ends[arc]):
+        assert math.isclose(math.dist(point, healed.centers[arc]), 10)
+    assert math.dist(healed.centers[arc], (0, 0)) < HEAL_TOLERANCE
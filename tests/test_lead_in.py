@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from cutter.containment import contour_polygon, point_in_polygon
+from cutter.gcode import GCode
+from cutter.lead_in import boundary_distance
+
+
+@pytest.fixture
+def assert_on_scrap(tool_radius, alignment, generate):
+    """按给定参数生成程序, 检查下刀点不在任何零件上, 刀具也碰不到零件"""
+
+    def check(geometry, **kwargs):
+        generator = GCode(
+            geometry, tool_radius, 0, 1000, 3, alignment=alignment, **kwargs
+        )
+        generate(generator)
+        parts = [contour_polygon(c) for c in generator.get_contours()]
+        for lead_in in generator.lead_ins:
+            point = np.asarray(lead_in)
+            assert sum(point_in_polygon(point, p) for p in parts) % 2 == 0
+            assert min(boundary_distance(point, p) for p in parts) >= tool_radius - 1e-6
+
+    return check
+
+
+def test_lead_in_outside_diamond_from_far_spindle(polylines_geometry, assert_on_scrap):
+    # 离主轴最近的顶点是尖角, 下刀点仍在零件外面
+    geometry = polylines_geometry([[(50, 0), (100, 50), (50, 100), (0, 50)]])
+    for software_compensation in (False, True):
+        assert_on_scrap(
+            geometry,
+            software_compensation=software_compensation,
+            start_position=(1000, 150),
+        )
+
+
+def test_lead_in_avoids_neighbouring_parts(
+    rectangles_geometry, tool_radius, assert_on_scrap
+):
+    # 间距正好是切缝宽度, 朝废料一侧的下刀点会落在相邻零件上
+    gap = 2 * tool_radius
+    geometry = rectangles_geometry([(0, 0, 100, 50), (0, 50 + gap, 100, 40)])
+    for software_compensation in (False, True):
+        assert_on_scrap(geometry, software_compensation=software_compensation)
@@ -0,0 +1,52 @@
+import numpy as np
+
+from cutter.nc_format import CompactFormatter, FixedFormatter
+
+
+def random_moves(count, seed=0):
+    rng = np.random.default_rng(seed)
+    # 坐标取在较少的几个值上, 出现重复的坐标、零长度段和 -0
+    points = rng.integers(-3, 4, (count, 2)) * 0.5 + rng.choice([0, -1e-6], (count, 2))
+    is_arc = rng.random(count) < 0.3
+    motions = np.where(is_arc, rng.integers(2, 4, count), 1)
+    offsets = np.where(is_arc[:, None], rng.normal(0, 2, (count, 2)), np.nan)
+    zs = np.where(rng.random(count) < 0.5, rng.integers(-2, 1, count) * 0.25, np.nan)
+    return motions, points, zs, offsets
+
+
+def block_by_block(formatter, motions, points, zs, offsets):
+    lines = []
+    for motion, (x, y), z, (i, j) in zip(motions.tolist(), points, zs, offsets):
+        lines.append(
+            formatter.block(
+                motion,
+                float(x),
+                float(y),
+                None if np.isnan(z) else float(z),
+                None if np.isnan(i) else float(i),
+                None if np.isnan(j) else float(j),
+            )
+        )
+    return lines
+
+
+def test_blocks_match_block():
+    moves = random_moves(2000)
+    for formatter_class in (FixedFormatter, CompactFormatter):
+        for precision in (0, 2, 3):
+            expected = block_by_block(formatter_class(precision), *moves)
+            formatter = formatter_class(precision)
+            # 分成两批, 第二批接着第一批的模态状态
+            first = formatter.blocks(*(m[:700] for m in moves))
+            second = formatter.blocks(*(m[700:] for m in moves))
+            assert first + second == expected
+
+
+def test_blocks_of_arcs_only():
+    # 整圆等只有圆弧的轮廓, I/J 在每一段都有
+    motions, points, zs, offsets = random_moves(50, seed=1)
+    offsets = np.where(np.isnan(offsets), 1.5, offsets)
+    motions = np.where(motions == 1, 2, motions)
+    for formatter_class in (FixedFormatter, CompactFormatter):
+        expected = block_by_block(formatter_class(), motions, points, zs, offsets)
+        assert formatter_class().blocks(motions, points, zs, offsets) == expected
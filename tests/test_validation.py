@@ -0,0 +1,16 @@
+from cutter.toolpath import parse_toolpath
+from cutter.validation import validate_toolpath
+
+TRAVEL = {"x": (0.0, 1300.0), "y": (0.0, 2500.0), "z": (-150.0, -1.0)}
+
+
+def test_unset_start_is_not_checked_against_travel():
+    # 程序开始前刀具位置未知, 假定的 Z0 不能当作超出行程
+    program = "G90\nG00 Z-90.000\nG00 X10.000 Y10.000\nG01 Z-103.000\n"
+    assert validate_toolpath(parse_toolpath(program), TRAVEL) == []
+
+
+def test_out_of_travel_move_is_reported():
+    program = "G90\nG00 Z-90.000\nG00 X10.000 Y10.000\nG01 Z-160.000\n"
+    problems = validate_toolpath(parse_toolpath(program), TRAVEL)
+    assert problems == [(3, "Z 轴超出机床行程")]